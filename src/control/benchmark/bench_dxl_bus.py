@@ -0,0 +1,105 @@
+## 제어 tick 1회의 goal position 전송 시간: 모터별 write4ByteTxRx (기존) vs GroupSyncWrite
+## 상태 읽기 시간: 모터별 read2ByteTxRx (전류 5개 + 위치 6개, 기존) vs StateReader (GroupSyncRead 1회)
+## 사용법: bench_dxl_bus.py [DEVICENAME] [tick 수]
+## 현재 위치를 그대로 목표값으로 쓰므로 팔은 움직이지 않음
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+sys.path.append(os.path.expanduser("~/DynamixelSDK/ros/dynamixel_sdk/src"))
+
+import time
+
+import numpy as np
+
+from dynamixel_sdk import PortHandler, PacketHandler, COMM_SUCCESS
+
+from dxl_bus import DxlBus, StateReader, wire_time, write_packet_bytes, sync_write_packet_bytes, STATUS_PACKET_BYTES
+
+
+DEVICENAME = '/dev/ttyUSB0'
+BAUDRATE = 3000000
+PROTOCOL_VERSION = 2.0
+ADDR_GOAL_POSITION = 116
+ADDR_PRESENT_POSITION = 132
+ADDR_PRESENT_CURRENT = 126
+ADDR_RETURN_DELAY_TIME = 9
+DXL_ID = [0, 1, 2, 3, 4, 5]
+
+
+def estimate(baudrate, num_ids, return_delay=0.0):
+    """ 전송 시간만 계산한 tick당 bus 시간 [s] (USB latency 제외)
+
+        @param return_delay: 모터의 status 응답 지연 [s] (Return Delay Time x 2 us)
+    """
+    legacy = num_ids * (wire_time(write_packet_bytes(4) + STATUS_PACKET_BYTES, baudrate) + return_delay)
+    sync = wire_time(sync_write_packet_bytes(4, num_ids), baudrate)
+    return legacy, sync
+
+
+def measure(func, ticks):
+    times = np.empty(ticks)
+    for i in range(ticks):
+        start = time.perf_counter()
+        func()
+        times[i] = time.perf_counter() - start
+    return times
+
+
+if __name__ == "__main__":
+    device = sys.argv[1] if len(sys.argv) > 1 else DEVICENAME
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    legacy, sync = estimate(BAUDRATE, len(DXL_ID))
+    print("wire time estimate @ {} bps, {} ids: write4ByteTxRx x{} {:.3f} ms, sync write {:.3f} ms".format(
+        BAUDRATE, len(DXL_ID), len(DXL_ID), legacy * 1000, sync * 1000))
+
+    port_handler = PortHandler(device)
+    packet_handler = PacketHandler(PROTOCOL_VERSION)
+    try:
+        opened = port_handler.openPort() and port_handler.setBaudRate(BAUDRATE)
+    except Exception as e:  # serial.SerialException (장치 없음)
+        print(e)
+        opened = False
+    if not opened:
+        print("cannot open {} at {} bps, estimate only".format(device, BAUDRATE))
+        sys.exit(0)
+
+    bus = DxlBus(port_handler, packet_handler)
+    present, result = bus.sync_read(ADDR_PRESENT_POSITION, 4, DXL_ID)
+    if result != COMM_SUCCESS or len(present) != len(DXL_ID):
+        print("no response from ids {}".format(sorted(set(DXL_ID) - set(present))))
+        port_handler.closePort()
+        sys.exit(1)
+    goal = [present[i] for i in DXL_ID]
+
+    delay, _ = bus.sync_read(ADDR_RETURN_DELAY_TIME, 1, DXL_ID)
+    return_delay = max(delay.values()) * 2e-6
+    legacy, sync = estimate(BAUDRATE, len(DXL_ID), return_delay)
+    print("with return delay {:.0f} us: write4ByteTxRx x{} {:.3f} ms, sync write {:.3f} ms".format(
+        return_delay * 1e6, len(DXL_ID), legacy * 1000, sync * 1000))
+
+    def legacy_tick():
+        for dxl_id, value in zip(DXL_ID, goal):
+            packet_handler.write4ByteTxRx(port_handler, dxl_id, ADDR_GOAL_POSITION, value)
+
+    def sync_tick():
+        bus.write_goal(ADDR_GOAL_POSITION, DXL_ID, goal)
+
+    def legacy_read():
+        for dxl_id in DXL_ID[:5]:
+            packet_handler.read2ByteTxRx(port_handler, dxl_id, ADDR_PRESENT_CURRENT)
+        for dxl_id in DXL_ID:
+            packet_handler.read2ByteTxRx(port_handler, dxl_id, ADDR_PRESENT_POSITION)
+
+    state_reader = StateReader(bus, DXL_ID)
+
+    print("{:>16} {:>10} {:>10} {:>10} {:>10}".format("path", "mean[ms]", "p50[ms]", "p99[ms]", "max[ms]"))
+    for name, func in [('write4ByteTxRx', legacy_tick), ('GroupSyncWrite', sync_tick),
+                       ('read2ByteTxRx', legacy_read), ('GroupSyncRead', state_reader.read)]:
+        measure(func, 10)
+        times = measure(func, ticks) * 1000
+        print("{:>16} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+            name, times.mean(), np.percentile(times, 50), np.percentile(times, 99), times.max()))
+
+    port_handler.closePort()
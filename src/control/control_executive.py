@@ -0,0 +1,192 @@
+## 제어 executive: 고정 주기 command/state thread + supervision(충돌 감지, telemetry) thread
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+# loop stats 토픽 (Float32MultiArray) data 순서
+LOOP_STATS_FIELDS = ('rate_hz', 'period_mean_ms', 'period_p50_ms', 'period_p99_ms',
+                     'jitter_p50_ms', 'jitter_p99_ms', 'jitter_max_ms', 'overruns', 'ticks')
+
+
+class Mailbox:
+    """ Lock-free single slot handoff between threads: put() replaces any value not taken yet.
+
+        deque append/popleft are atomic, so ROS callbacks never block the control thread.
+    """
+    def __init__(self):
+        self.slot = deque(maxlen=1)
+
+    def put(self, value):
+        self.slot.append(value)
+
+    def take(self):
+        """ @return: the latest value put since the last take, or None"""
+        try:
+            return self.slot.popleft()
+        except IndexError:
+            return None
+
+
+class LoopStats:
+    """ Period and jitter of a fixed-rate loop over the last window ticks.
+
+        jitter  = tick start - scheduled start
+        overrun = a tick finished after the next scheduled start (that start is skipped)
+    """
+    def __init__(self, rate, window=1000):
+        self.rate = rate
+        self.periods = np.zeros(window)
+        self.jitters = np.zeros(window)
+        self.ticks = 0
+        self.overruns = 0
+        self.last_start = None
+
+    def record(self, scheduled, start):
+        if self.last_start is not None:
+            k = self.ticks % len(self.periods)
+            self.periods[k] = start - self.last_start
+            self.jitters[k] = start - scheduled
+            self.ticks += 1
+        self.last_start = start
+
+    def summary(self):
+        n = min(self.ticks, len(self.periods))
+        if n == 0:
+            return dict.fromkeys(LOOP_STATS_FIELDS, 0.0)
+        periods = self.periods[:n] * 1000
+        jitters = self.jitters[:n] * 1000
+        return {'rate_hz': float(self.rate),
+                'period_mean_ms': float(periods.mean()),
+                'period_p50_ms': float(np.percentile(periods, 50)),
+                'period_p99_ms': float(np.percentile(periods, 99)),
+                'jitter_p50_ms': float(np.percentile(jitters, 50)),
+                'jitter_p99_ms': float(np.percentile(jitters, 99)),
+                'jitter_max_ms': float(jitters.max()),
+                'overruns': self.overruns,
+                'ticks': self.ticks}
+
+
+class PeriodicThread(threading.Thread):
+    """ Calls step() at a fixed rate on absolute deadlines (no drift).
+
+        A tick that runs past the next deadline counts as an overrun and the missed
+        deadlines are skipped instead of running back to back.
+    """
+    def __init__(self, name, rate, step, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.period = 1.0 / rate
+        self.step = step
+        self.stop_event = stop_event
+        self.stats = LoopStats(rate)
+        self.error = None
+
+    def run(self):
+        deadline = time.perf_counter()
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            self.stats.record(deadline, start)
+            try:
+                self.step()
+            except Exception as e:
+                self.error = e
+                self.stop_event.set()
+                raise
+
+            deadline += self.period
+            now = time.perf_counter()
+            if now > deadline:
+                self.stats.overruns += 1
+                deadline += np.ceil((now - deadline) / self.period) * self.period
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+
+class ControlExecutive:
+    """ Runs the motor control node on two threads.
+
+        command thread (control_rate, >= 100 Hz): the only user of the bus.
+            read joint state -> impact detection on the sample (stops the trajectory at once)
+            -> take new setpoints from the mailbox -> step the trajectory at trajectory_rate
+            -> write goal positions (unchanged values are elided)
+        supervision thread (supervision_rate): impact notification and telemetry on the
+            latest state sample, loop stats publishing every stats_period seconds.
+    """
+    def __init__(self, dynamixel, pose, on_impact, publish_stats,
+                 control_rate=100.0, trajectory_rate=15.0, supervision_rate=15.0, stats_period=1.0):
+        self.dynamixel = dynamixel
+        self.pose = pose
+        self.on_impact = on_impact
+        self.publish_stats = publish_stats
+        self.trajectory_period = 1.0 / trajectory_rate
+        self.stats_period = stats_period
+
+        self.stop_event = threading.Event()
+        self.command = PeriodicThread('command', control_rate, self.command_step, self.stop_event)
+        self.supervision = PeriodicThread('supervision', supervision_rate, self.supervision_step, self.stop_event)
+
+        self.sample = None              # (time, state 복사본): command -> supervision (참조 교체만)
+        self.impacts = Mailbox()        # 충돌 감지 -> supervision (GUI 알림)
+        self.next_trajectory_step = None
+        self.next_stats = time.perf_counter() + stats_period
+
+    def command_step(self):
+        now = time.perf_counter()
+        state = self.dynamixel.read_state()
+        self.sample = (time.time(), state.copy())
+
+        # 충돌 감지는 모든 sample에서, 감지되면 바로 trajectory 정지
+        if self.dynamixel.detect_impact(state) == 1:
+            self.pose.stop_state = True
+            self.impacts.put(True)
+
+        # 콜백에서 만든 trajectory로 교체 (stop 중에도)
+        self.pose.receive()
+
+        # trajectory 한 점은 trajectory_rate마다 (제어 주기와 무관하게 기존 속도 유지)
+        # 이전 deadline에서 한 주기씩 (now 기준이면 제어 tick 단위로 늦어져 느려짐), 한 주기 넘게 밀리면 다시 맞춤
+        if self.next_trajectory_step is None or now >= self.next_trajectory_step:
+            if self.next_trajectory_step is None or now - self.next_trajectory_step >= self.trajectory_period:
+                self.next_trajectory_step = now
+            self.next_trajectory_step += self.trajectory_period
+            if self.pose.stop_state == False:
+                self.pose.pose_update()
+
+        self.dynamixel.pub_pose(self.pose.last_pose)
+        self.dynamixel.bus.tick()
+
+    def supervision_step(self):
+        if self.impacts.take():
+            self.on_impact()
+
+        sample = self.sample
+        if sample is not None:
+            _, state = sample
+            self.dynamixel.monitor_current(state)
+
+        now = time.perf_counter()
+        if now >= self.next_stats:
+            self.next_stats = now + self.stats_period
+            self.publish_stats(self.stats())
+
+    def stats(self):
+        return {'command': self.command.stats.summary(),
+                'supervision': self.supervision.stats.summary(),
+                'bus': self.dynamixel.bus.stats()}
+
+    def start(self):
+        self.command.start()
+        self.supervision.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self, is_shutdown):
+        # is_shutdown: rospy.is_shutdown
+        while not self.stop_event.wait(0.2):
+            if is_shutdown():
+                self.stop()
+        self.command.join()
+        self.supervision.join()
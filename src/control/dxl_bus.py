@@ -0,0 +1,251 @@
+## Dynamixel bus layer: 모든 모터에 같은 주소를 쓰는 명령은 GroupSyncWrite 패킷 하나로,
+## 모든 모터의 상태(전류, 속도, 위치, moving)는 GroupSyncRead 한번으로
+
+import time
+
+import numpy as np
+
+from dynamixel_sdk import GroupSyncWrite, GroupSyncRead, COMM_SUCCESS
+
+
+# Protocol 2.0 패킷 크기 [byte]: header(4) + id(1) + length(2) + instruction(1) + crc(2) = 10 + parameter
+PACKET_OVERHEAD = 10
+STATUS_PACKET_BYTES = PACKET_OVERHEAD + 1   # + error
+
+
+def to_bytes(value, length):
+    # little endian (음수는 2의 보수)
+    return list((int(value) & ((1 << (8 * length)) - 1)).to_bytes(length, 'little'))
+
+
+def wire_time(num_bytes, baudrate):
+    """ @return: num_bytes를 보내는 시간 [s] (start + 8 data + stop = 10 bit/byte)"""
+    return num_bytes * 10.0 / baudrate
+
+
+def write_packet_bytes(length):
+    # WRITE 명령 1개: address(2) + data
+    return PACKET_OVERHEAD + 2 + length
+
+
+def sync_write_packet_bytes(length, num_ids):
+    # SYNC WRITE: address(2) + data length(2) + (id + data) x N
+    return PACKET_OVERHEAD + 4 + num_ids * (1 + length)
+
+
+# XM430 control table 122 ~ 135 연속 구간: 한번의 sync read로 읽는 상태
+STATE_ADDR = 122
+STATE_FIELDS = [
+    # (이름, address, length, 부호)
+    ('moving', 122, 1, False),
+    ('moving_status', 123, 1, False),
+    ('pwm', 124, 2, True),
+    ('current', 126, 2, True),
+    ('velocity', 128, 4, True),
+    ('position', 132, 4, True),
+]
+STATE_LENGTH = 14
+
+# 모터 1개의 상태 (read마다 같은 배열을 덮어씀)
+STATE_DTYPE = np.dtype([
+    ('id', np.uint8),
+    ('ok', np.bool_),           # 이번 read에서 응답 여부 (False면 이전 값 유지)
+    ('moving', np.uint8),
+    ('moving_status', np.uint8),
+    ('pwm', np.int16),
+    ('current', np.int16),
+    ('velocity', np.int32),
+    ('position', np.int32),
+])
+
+
+class BusTimer:
+    """ Bus time per control tick: time spent in port transactions between tick() calls."""
+    def __init__(self):
+        self.current = 0.0
+        self.packets = 0
+        self.ticks = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.total_packets = 0
+
+    def add(self, elapsed):
+        self.current += elapsed
+        self.packets += 1
+
+    def tick(self):
+        if self.packets == 0:
+            return
+        self.ticks += 1
+        self.total += self.current
+        self.max = max(self.max, self.current)
+        self.total_packets += self.packets
+        self.current = 0.0
+        self.packets = 0
+
+    def stats(self):
+        ticks = max(self.ticks, 1)
+        return {'ticks': self.ticks, 'mean_ms': self.total / ticks * 1000, 'max_ms': self.max * 1000,
+                'packets_per_tick': self.total_packets / ticks}
+
+
+class DxlBus:
+    """ Grouped commands to the servos on one port.
+
+        sync_write sends one instruction packet for all ids (no status packets),
+        instead of one write + status round trip per id.
+
+        Every written value is kept in a shadow of the control tables. With elide=True
+        only ids whose value differs from the shadow are sent, and nothing at all when
+        none changed. An id is also sent once keepalive seconds passed since its own
+        value was last sent, even while other ids keep changing (sync write is not
+        acknowledged, so a lost packet or a rebooted servo is corrected within keepalive).
+    """
+    def __init__(self, port_handler, packet_handler, keepalive=1.0):
+        self.port_handler = port_handler
+        self.packet_handler = packet_handler
+        self.writers = {}       # (address, length) -> GroupSyncWrite
+        self.timer = BusTimer()
+
+        self.keepalive = keepalive      # [s]
+        self.shadow = {}                # (id, address, length) -> 마지막으로 보낸 값
+        self.last_sent = {}             # (id, address, length) -> 마지막 전송 시간 (time.monotonic())
+        self.sent = 0                   # 보낸 id 값 수 (패킷 수는 timer의 packets_per_tick)
+        self.elided = 0                 # 값이 같아서 보내지 않은 id 값 수
+
+    def writer(self, address, length):
+        key = (address, length)
+        if key not in self.writers:
+            self.writers[key] = GroupSyncWrite(self.port_handler, self.packet_handler, address, length)
+        return self.writers[key]
+
+    def sync_write(self, address, length, values, elide=False):
+        """ @param values: {id: value} (같은 address, 같은 length)
+            @param elide: shadow와 같은 값은 보내지 않음 (id별로 keepalive가 지나면 다시 보냄)
+
+            @return: comm result of the sync write packet (COMM_SUCCESS if nothing had to be sent)
+        """
+        values = {dxl_id: int(value) for dxl_id, value in values.items()}
+        now = time.monotonic()
+
+        if elide:
+            # 값이 바뀐 id + 마지막 전송 후 keepalive가 지난 id만
+            count = len(values)
+            values = {dxl_id: value for dxl_id, value in values.items()
+                      if self.shadow.get((dxl_id, address, length)) != value
+                      or now - self.last_sent.get((dxl_id, address, length), -np.inf) >= self.keepalive}
+            self.elided += count - len(values)
+            if not values:
+                return COMM_SUCCESS
+
+        writer = self.writer(address, length)
+        writer.clearParam()
+        for dxl_id, value in values.items():
+            writer.addParam(dxl_id, to_bytes(value, length))
+
+        start = time.perf_counter()
+        result = writer.txPacket()
+        self.timer.add(time.perf_counter() - start)
+        self.sent += len(values)
+
+        if result == COMM_SUCCESS:
+            for dxl_id, value in values.items():
+                self.shadow[(dxl_id, address, length)] = value
+                self.last_sent[(dxl_id, address, length)] = now
+        else:
+            # 전송 실패: 다음 write에서 다시 보내도록
+            self.invalidate(address, length)
+        return result
+
+    def invalidate(self, address=None, length=None):
+        """ shadow 삭제 (address가 없으면 전체). 재부팅, torque off 등 모터 쪽 값이 바뀌었을 때"""
+        for key in [k for k in self.shadow if address is None or k[1:] == (address, length)]:
+            del self.shadow[key]
+            self.last_sent.pop(key, None)
+
+    def write_goal(self, address, ids, values, length=4):
+        # 관절 순서대로 나열된 값 (numpy 배열 가능). 바뀐 관절만 전송
+        return self.sync_write(address, length, dict(zip(ids, np.asarray(values).tolist())), elide=True)
+
+    def write_config(self, table):
+        """ 시작 설정을 항목별 sync write 한번씩으로 전송
+
+            @param table: [(name, address, length, {id: value}), ...] (순서대로 전송)
+
+            @return: 전송에 실패한 항목 이름 목록
+        """
+        failed = []
+        for name, address, length, values in table:
+            if self.sync_write(address, length, values) != COMM_SUCCESS:
+                failed.append(name)
+        return failed
+
+    def sync_read(self, address, length, ids):
+        """ 같은 주소를 여러 모터에서 한번에 읽음
+
+            @return: {id: value} (응답이 없는 id는 제외), comm result
+        """
+        reader = GroupSyncRead(self.port_handler, self.packet_handler, address, length)
+        for dxl_id in ids:
+            reader.addParam(dxl_id)
+
+        start = time.perf_counter()
+        result = reader.txRxPacket()
+        self.timer.add(time.perf_counter() - start)
+
+        values = {}
+        for dxl_id in ids:
+            if reader.isAvailable(dxl_id, address, length):
+                values[dxl_id] = reader.getData(dxl_id, address, length)
+        return values, result
+
+    def tick(self):
+        self.timer.tick()
+
+    def stats(self):
+        stats = self.timer.stats()
+        stats.update({'sent': self.sent, 'elided': self.elided})
+        return stats
+
+
+class StateReader:
+    """ Present current, velocity, position and moving flag of all ids in one GroupSyncRead.
+
+        read() fills and returns the same preallocated STATE_DTYPE record [len(ids)],
+        ordered like ids.
+    """
+    def __init__(self, bus, ids):
+        self.bus = bus
+        self.ids = list(ids)
+        self.reader = GroupSyncRead(bus.port_handler, bus.packet_handler, STATE_ADDR, STATE_LENGTH)
+        for dxl_id in self.ids:
+            self.reader.addParam(dxl_id)
+
+        self.state = np.zeros(len(self.ids), dtype=STATE_DTYPE)
+        self.state['id'] = self.ids
+        self.stamp = None       # 마지막으로 성공한 read 시간 (time.time())
+        self.failures = 0
+
+    def read(self):
+        """ @return: STATE_DTYPE record [len(ids)] (in place), comm result"""
+        start = time.perf_counter()
+        result = self.reader.txRxPacket()
+        self.bus.timer.add(time.perf_counter() - start)
+
+        state = self.state
+        for k, dxl_id in enumerate(self.ids):
+            ok = self.reader.isAvailable(dxl_id, STATE_ADDR, STATE_LENGTH)
+            state['ok'][k] = ok
+            if not ok:
+                continue
+            for name, address, length, signed in STATE_FIELDS:
+                value = self.reader.getData(dxl_id, address, length)
+                if signed and value >= 1 << (8 * length - 1):  # 부호 확장
+                    value -= 1 << (8 * length)
+                state[name][k] = value
+
+        if result == COMM_SUCCESS:
+            self.stamp = time.time()
+        else:
+            self.failures += 1
+        return state, result
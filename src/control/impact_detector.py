@@ -0,0 +1,71 @@
+## 관절 전류 ring buffer 기반 충돌 감지 (모든 관절을 한번에 계산)
+
+import numpy as np
+
+
+class ImpactDetector:
+    """ Collision detection on joint currents, updated on every state sample.
+
+        Currents go into a fixed-capacity circular buffer [capacity x joints] (optionally
+        low-pass filtered first). With lag L samples:
+            diff_1st = |c[t] - c[t-L]|
+            diff_2nd = |diff_1st[t] - diff_1st[t-L]|
+        An impact is a joint with diff_2nd >= its threshold, or a group of joints whose
+        sum of diff_2nd / threshold reaches the group limit (e.g. diagonal = joint 0 + 2).
+
+        L is the sample spacing the thresholds were tuned for (e.g. 1/15 s at a 100 Hz
+        state rate -> L = 7), so the same thresholds hold while every sample is checked.
+    """
+    def __init__(self, thresholds, lag=1, combined=(), alpha=1.0, capacity=None):
+        """ @param thresholds: [joints] diff_2nd threshold per joint (<= 0: not checked)
+            @param combined: [(joint indices, limit), ...] (joints not checked add nothing to the sum)
+            @param alpha: exponential filter weight of the new sample (1.0: no filtering)
+            @param capacity: buffer rows (at least 2 * lag + 1)
+        """
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.limits = np.where(self.thresholds > 0, self.thresholds, np.inf)
+        self.lag = max(1, int(lag))
+        self.combined = [(np.asarray(joints), limit) for joints, limit in combined]
+        self.alpha = alpha
+        self.capacity = max(capacity or 0, 2 * self.lag + 1)
+
+        joints = len(self.thresholds)
+        self.buffer = np.zeros((self.capacity, joints))
+        self.diff_1st = np.zeros(joints)
+        self.diff_2nd = np.zeros(joints)
+        self.exceeded = np.zeros(joints, dtype=bool)       # 마지막 update에서 threshold를 넘은 관절
+        self.combined_exceeded = [False] * len(self.combined)
+        self.reset()
+
+    def reset(self):
+        self.head = -1
+        self.count = 0
+
+    def update(self, current):
+        """ @param current: [joints] present currents of one sample
+
+            @return: True if an impact is detected at this sample
+        """
+        current = np.asarray(current, dtype=float)
+        if self.alpha < 1.0 and self.count > 0:
+            current = self.alpha * current + (1.0 - self.alpha) * self.buffer[self.head]
+
+        self.head = (self.head + 1) % self.capacity
+        self.buffer[self.head] = current
+        self.count += 1
+
+        # 1차 미분 2개가 모일 때까지는 판단하지 않음
+        if self.count < 2 * self.lag + 1:
+            return False
+
+        now = self.buffer[self.head]
+        mid = self.buffer[(self.head - self.lag) % self.capacity]
+        old = self.buffer[(self.head - 2 * self.lag) % self.capacity]
+        np.abs(now - mid, out=self.diff_1st)
+        np.abs(self.diff_1st - np.abs(mid - old), out=self.diff_2nd)
+
+        np.greater_equal(self.diff_2nd, self.limits, out=self.exceeded)
+        # threshold 0인 관절은 limits가 inf이므로 합에 0으로 들어감
+        self.combined_exceeded = [(self.diff_2nd[joints] / self.limits[joints]).sum() >= limit
+                                  for joints, limit in self.combined]
+        return bool(self.exceeded.any()) or any(self.combined_exceeded)
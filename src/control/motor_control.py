@@ -18,6 +18,10 @@ from dynamixel_sdk.port_handler import PortHandler
 from dynamixel_sdk.packet_handler import PacketHandler
 from dynamixel_sdk.robotis_def import *
 
+from dxl_bus import DxlBus, StateReader
+from control_executive import ControlExecutive, Mailbox, LOOP_STATS_FIELDS
+from impact_detector import ImpactDetector
+
 from std_msgs.msg import Float32MultiArray as fl
 from std_msgs.msg import Float32, Bool, String
 # import threading
@@ -55,6 +59,7 @@ XM_PROTOCOL_VERSION = 2.0
 
 XM_DXL_ID = [0, 1, 2, 3, 4]
 gripper_DXL_ID = 5
+ALL_DXL_ID = XM_DXL_ID + [gripper_DXL_ID]
 XM_BAUDRATE = 3000000
 
 XM_TORQUE_ENABLE = 1
@@ -123,67 +128,41 @@ def cubic_trajectory(th_i, th_f): # input(degree) : 시작각도, 나중각도 -
     return theta.T
 
 class Impact: # 작업 완료
+    # 관절별 이름 (충돌 로그)
+    joint_names = {0: '수평', 1: 'XM_1', 2: '수직'}
+
     def __init__(self):
-        self.last_torgue = np.array([])
-        self.diff_torques = np.array([]).reshape(0,5)
+        # 전류 2차 변화량 threshold (관절 0~4, 0 이하면 검사 안 함), 대각선 = 관절 0 + 2
+        # 변화량은 ~impact_lag [s] 간격 (기존 15 Hz tick 간격) 으로 계산하고 상태를 읽을 때마다 검사
+        state_rate = rospy.get_param('~control_rate', 100.0)
+        self.detector = ImpactDetector(
+            thresholds=rospy.get_param('~impact_thresholds', [80, 150, 80, 0, 0]),
+            lag=round(rospy.get_param('~impact_lag', 1/15) * state_rate),
+            combined=[((0, 2), rospy.get_param('~impact_diagonal', 1.5))],
+            alpha=rospy.get_param('~impact_filter_alpha', 1.0))
+
         self.diff_1st = rospy.Publisher('/diff_1st', Float32, queue_size=10)
         self.diff_2nd = rospy.Publisher('/diff_2nd', Float32, queue_size=10)
         self.impact_to_gui = rospy.Publisher('/impact_to_gui', Bool, queue_size=10)
 
-    def diff(self, current_torque): # 입력 : 현재 토크 값, 출력은 없으며 전역 변수 diff_torques에 토크 변화량이 저장됨
-        # print("#######미분#######")
-        current_torque = np.array(current_torque)
-        diff_torque = np.zeros(5)
-        if len(self.last_torgue)!=0: # last_torque 존재 시  
-            diff_torque = self.last_torgue - current_torque
-            self.last_torgue = current_torque
-            self.diff_torques = np.append(self.diff_torques,[np.abs(diff_torque)], axis = 0)
-        else:
-            self.last_torgue = current_torque
-
-        if self.diff_torques.shape[0]>=10: # 10개 이상의 토크 미분값이 저장된 경우
-            self.diff_torques[0] = self.diff_torques[8]
-            self.diff_torques[1] = self.diff_torques[9]
-            self.diff_torques = self.diff_torques[:2]
-        self.diff_1st.publish(diff_torque[1])
-
-    def impact_check(self):
-        #print("#######충격 확인#######")
-        diff_torques_num = self.diff_torques.shape[0] # 저장된 변화량의 개수
-        # dof = self.diff_torques.shape[1] # 모터의 개수(5)
-        diff_2nd = np.zeros(5) # 토크 변화량의 기울기가 급변할 때를 파악하기 위함.
-
-        result = 0 # 충돌 결과
-        if self.diff_torques.shape[0] >= 2: # 1차 미분값이 2개 이상 모이면
-            for i in range(5):
-                diff_2nd[i] = self.diff_torques[diff_torques_num-1][i]-self.diff_torques[diff_torques_num-2][i]
-            diff_2nd = np.abs(diff_2nd)
-            
-            if diff_2nd[0] >= 80: # 수평 방향 충돌 감지
-                result = 1
-                rospy.logerr('########## impact 발생(수평) ')
-
-            if diff_2nd[1] >= 150: # XM_1 방향 충돌 감지
-                result = 1
-                rospy.logerr('########## impact 발생(XM_1) ')
+    def update(self, current_torque): # 입력 : 현재 link 모터 전류, 출력 : 충돌 결과 (1 : 충돌)
+        if not self.detector.update(current_torque):
+            return 0
 
-            if diff_2nd[2] >= 80: # 수직 방향 충돌 감지
-                result = 1
-                rospy.logerr('########## impact 발생(수직)')
+        for joint in np.nonzero(self.detector.exceeded)[0]:
+            rospy.logerr('########## impact 발생({}) '.format(self.joint_names.get(joint, 'XM_{}'.format(joint))))
+        if any(self.detector.combined_exceeded):
+            rospy.logerr('########## impact 발생(대각선)')
+        return 1
 
-            if diff_2nd[0]/80 + diff_2nd[2]/80 >= 1.5: # 수직 방향 충돌 감지
-                result = 1
-                rospy.logerr('########## impact 발생(대각선)')
-            
-        self.diff_2nd.publish(diff_2nd[1])                
+    def publish(self): # 전류 변화량 plot (XM_1)
+        self.diff_1st.publish(self.detector.diff_1st[1])
+        self.diff_2nd.publish(self.detector.diff_2nd[1])
 
-        return result
-            
     def print_info(self, test_data):
         print("input data : ",test_data)
-        print("last_torque : ",self.last_torgue)
-        print("diff_torques : ",self.diff_torques)
-        # print("last_diff_2nd : ",self.last_diff_2nd)
+        print("diff_1st : ",self.detector.diff_1st)
+        print("diff_2nd : ",self.detector.diff_2nd)
 
 
 class DynamixelNode:
@@ -227,68 +206,48 @@ class DynamixelNode:
             rospy.signal_shutdown("Failed to set the XM baudrate.")
             return
         
-        # link 모터의 토크 활성화
-        for dxl_id in XM_DXL_ID:
-            dxl_comm_result, dxl_error = self.packet_handler_xm.write1ByteTxRx(self.port_handler_xm, dxl_id, XM_ADDR_TORQUE_ENABLE, XM_TORQUE_ENABLE)
-            dxl_comm_result, dxl_error = self.packet_handler_xm.write1ByteTxRx(self.port_handler_xm, dxl_id, XM_ADDR_PROFILE_ACCELERATION, 5)
-
-            if dxl_comm_result != COMM_SUCCESS:
-                rospy.logerr("Failed to enable torque for XM Motor ID: {}".format(dxl_id))
-                rospy.signal_shutdown("Failed to enable torque for XM Motor ID: {}".format(dxl_id))
-                return
-            else:
-                rospy.loginfo("Torque enabled for XM Motor ID: {}".format(dxl_id))
-        
-        # gripper 모터의 토크 활성화
-        dxl_comm_result, dxl_error = self.packet_handler_xm.write1ByteTxRx(self.port_handler_xm, gripper_DXL_ID, XM_ADDR_TORQUE_ENABLE, XM_TORQUE_ENABLE)
-        dxl_comm_result, dxl_error = self.packet_handler_xm.write1ByteTxRx(self.port_handler_xm, gripper_DXL_ID, XM_ADDR_PROFILE_ACCELERATION, 5)
-        if dxl_comm_result != COMM_SUCCESS:
-            rospy.logerr("Failed to enable torque for XM Motor ID: {}".format(gripper_DXL_ID))
-            rospy.signal_shutdown("Failed to enable torque for XM Motor ID: {}".format(gripper_DXL_ID))
+        # 시작 설정: 항목마다 sync write 한번 (모터별 write + status 왕복 없음)
+        # 길이는 기존 writeNByteTxRx와 동일 (D gain 4byte 쓰기는 I gain(82)도 0으로 씀)
+        # 같은 목표값은 다시 보내지 않음 (~keepalive [s] 마다는 전부 다시 전송)
+        self.bus = DxlBus(self.port_handler_xm, self.packet_handler_xm, keepalive=rospy.get_param('~keepalive', 1.0))
+        config = [
+            ('torque enable', XM_ADDR_TORQUE_ENABLE, 1, {i: XM_TORQUE_ENABLE for i in ALL_DXL_ID}),
+            ('profile acceleration', XM_ADDR_PROFILE_ACCELERATION, 1, {i: 5 for i in ALL_DXL_ID}),
+            ('position P gain', XM_ADDR_POSITION_P_GAIN, 4, {0: 800, 1: 300, 2: 800, 3: 800, 4: 800, 5: 800}),
+            ('profile velocity', XM_ADDR_PROFILE_VELOCITY, 4, {i: 180 for i in ALL_DXL_ID}),
+            ('position D gain', XM_ADDR_POTISION_D_GAIN, 4, {i: 10 for i in XM_DXL_ID}),
+            ('feedforward 1st gain', XM_ADDR_FEEDFORWARD_1ST_GAIN, 4, {i: 10 for i in XM_DXL_ID}),
+        ]
+        failed = self.bus.write_config(config)
+        if failed:
+            rospy.logerr("Failed to send XM settings: {}".format(failed))
+
+        # sync write는 응답이 없으므로 토크 활성화는 한번에 다시 읽어서 확인
+        torque, _ = self.bus.sync_read(XM_ADDR_TORQUE_ENABLE, 1, ALL_DXL_ID)
+        missing = [dxl_id for dxl_id in ALL_DXL_ID if torque.get(dxl_id) != XM_TORQUE_ENABLE]
+        if missing:
+            rospy.logerr("Failed to enable torque for XM Motor ID: {}".format(missing))
+            rospy.signal_shutdown("Failed to enable torque for XM Motor ID: {}".format(missing))
             return
-        else:
-            rospy.loginfo("Torque enabled for XM Motor ID: {}".format(gripper_DXL_ID))        
-        
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 0, XM_ADDR_POSITION_P_GAIN, 800) 
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 1, XM_ADDR_POSITION_P_GAIN, 300)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 2, XM_ADDR_POSITION_P_GAIN, 800)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 3, XM_ADDR_POSITION_P_GAIN, 800) 
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 4, XM_ADDR_POSITION_P_GAIN, 800)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 5, XM_ADDR_POSITION_P_GAIN, 800)         
-        
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 0, XM_ADDR_PROFILE_VELOCITY, 180) 
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 1, XM_ADDR_PROFILE_VELOCITY, 180)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 2, XM_ADDR_PROFILE_VELOCITY, 180)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 3, XM_ADDR_PROFILE_VELOCITY, 180) 
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 4, XM_ADDR_PROFILE_VELOCITY, 180)
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, 5, XM_ADDR_PROFILE_VELOCITY, 180) 
+        rospy.loginfo("Torque enabled for XM Motor ID: {}".format(ALL_DXL_ID))
+        self.bus.tick()
+        rospy.loginfo("XM settings sent: {}".format(self.bus.stats()))
 
-        
-        # p gain 설정
-        for i in range(0,5):
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_POSITION_P_GAIN, 400) #800 -> 200``
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_POSITION_I_GAIN, 5) #0
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_POSITION_I_GAIN, 800) #0
-            self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_POTISION_D_GAIN, 10) #0
-
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_VELOCITY_I_GAIN, 1920) #1920
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_VELOCITY_P_GAIN, 200) #100
-            self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_FEEDFORWARD_1ST_GAIN, 10) #0
-            #self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, i, XM_ADDR_FEEDFORWARD_2ND_GAIN, 20) #0
-
-    def read_motor_position(self, port_handler, packet_handler, dxl_id, addr_present_position): # 현재 모터 value 도출해주는 메서드
-        # 모터의 현재 위치 읽기
-        dxl_present_position, _, _ = packet_handler.read2ByteTxRx(port_handler, dxl_id, addr_present_position)
-        return dxl_present_position
+        # 관절 상태는 모두 여기서 (ALL_DXL_ID 순서의 구조체 배열, 매 read마다 같은 배열 갱신)
+        self.state_reader = StateReader(self.bus, ALL_DXL_ID)
+
+    def read_state(self): # 6개 모터의 전류, 속도, 위치, moving을 한번에 읽음
+        # 응답이 없는 모터는 state['ok']가 False이고 이전 값 유지
+        state, _ = self.state_reader.read()
+        return state
 
     def move_current_to_goal(self, goal_pose): # 현재 각도 읽고, 목표 각도 까지 trajectory 만들어서 제어, input : 목표 각도(출발 각도는 받지 않아도 모터 자체에서 현재 각도 확인 후 traj)
         rate = rospy.Rate(15)
         goal_dynamixel = degree_to_dynamixel_value(goal_pose)
-        present_position = np.zeros(6)
         print('goal degree : ', goal_pose[:5], 'grip : ', goal_pose[5])
 
-        for dxl_id in range(0,6):
-            present_position[dxl_id] = self.read_motor_position(self.port_handler_xm, self.packet_handler_xm, dxl_id, XM_ADDR_PRESENT_POSITION)
+        # present position (132, 4byte)을 6개 모터 한번에
+        present_position = self.read_state()['position'].astype(float)
 
         print('현재 : ', present_position)
         print('목표 : ', goal_dynamixel)
@@ -299,14 +258,12 @@ class DynamixelNode:
         position_dynamixel_above = position_dynamixel_above.astype(int)
         position_dynamixel = position_dynamixel.astype(int)
 
+        # trajectory 점마다 6개 모터 목표값을 sync write 한번으로
         for n in range(N):
-            for dxl_id in range(0,6):
-                self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, dxl_id, XM_ADDR_GOAL_POSITION, position_dynamixel_above[n][dxl_id])
+            self.bus.write_goal(XM_ADDR_GOAL_POSITION, ALL_DXL_ID, position_dynamixel_above[n])
 
         for n in range(N):
-            for dxl_id in range(0,6):
-                # print("Set Goal XM_Position of ID %s = %s" % (XM_DXL_ID[dxl_id], xm_position[dxl_id]))
-                self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, dxl_id, XM_ADDR_GOAL_POSITION, position_dynamixel[n][dxl_id])
+            self.bus.write_goal(XM_ADDR_GOAL_POSITION, ALL_DXL_ID, position_dynamixel[n])
         
             rospy.loginfo("모터 제어 value : %d, %d, %d, %d, %d, %d", *position_dynamixel[n])
         rate.sleep()
@@ -316,11 +273,9 @@ class DynamixelNode:
     def pub_pose(self, pose):
         dynamixel_value = degree_to_dynamixel_value(pose) 
         # print(dynamixel_value)
-        for dxl_id in XM_DXL_ID:
-            # print("Set Goal XM_Position of ID %s = %s" % (XM_DXL_ID[dxl_id], xm_position[dxl_id]))
-            self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, dxl_id, XM_ADDR_GOAL_POSITION, dynamixel_value[dxl_id])
-
-        self.packet_handler_xm.write4ByteTxRx(self.port_handler_xm, gripper_DXL_ID, XM_ADDR_GOAL_POSITION, dynamixel_value[5]) ## 그리퍼 별도 제어
+        # link 5개 + 그리퍼 목표값을 sync write 패킷 하나로 (status 응답 대기 없음)
+        # 정지/대기 중처럼 마지막으로 보낸 값과 같으면 전송 생략 (keepalive 주기로만 다시 보냄)
+        self.bus.write_goal(XM_ADDR_GOAL_POSITION, ALL_DXL_ID, dynamixel_value)
         # rospy.loginfo("모터 제어 degree : %.2f, %.2f, %.2f, %.2f, %.2f // gripper : %.2f", *pose)
         # rospy.loginfo("모터 제어 value : %d, %d, %d, %d, %d // gripper : %.2f", *dynamixel_value)       
 
@@ -329,35 +284,24 @@ class DynamixelNode:
         self.port_handler_xm.closePort()    
         rospy.loginfo("Shutdown Dynamixel node.")
         
-    def read_motor_current(self, dxl_id): # 주어진 id의 모터에 대한 전류 값 반환
-        # 모터의 현재 전류 값 읽기
-        dxl_present_current, dxl_comm_result, dxl_error = self.packet_handler_xm.read2ByteTxRx(self.port_handler_xm, dxl_id, XM_CURRENT_ADDR)
-        
-        if dxl_comm_result != COMM_SUCCESS:
-            # rospy.logerr("Failed to read current for XM Motor ID: {}".format(dxl_id))
-            return None
-        
-        # 전류 값을 부호 있는 정수로 변환
-        if dxl_present_current >= 32768:  # 음수 값 처리를 위한 부호 확장
-            dxl_present_current -= 65536
-        
-        return dxl_present_current
-        
-    def monitor_current(self): # 모터 전류값 모니터링하는 메서드. 모니터링 후 충격 확인까지 진행
-        global t
-        data_t = np.zeros(5)
-        result = 0
-        
-        for dxl_id in XM_DXL_ID:
-            torque_value = self.read_motor_current(dxl_id)
-            if torque_value is not None:
-                # rospy.loginfo("XM Motor ID: {}, Current Torque: {:.2f}, Direction: {}".format(dxl_id, torque, direction))  
-                data_t[dxl_id] = torque_value
+    def detect_impact(self, state): # 상태를 읽을 때마다 충격 확인 (제어 thread)
+        link = state[:len(XM_DXL_ID)]
+        # 응답이 없는 모터가 있는 sample은 건너뜀 (0으로 채우면 가짜 충돌)
+        if not link['ok'].all():
+            return 0
+        return self.impact.update(link['current'])
+
+    def monitor_current(self, state=None): # 모터 전류값, 변화량 plot (supervision thread)
+        # state: read_state() 결과 (없으면 새로 읽음)
+        if state is None:
+            state = self.read_state()
+
+        # link 모터 5개 전류 (응답이 없는 모터는 0)
+        link = state[:len(XM_DXL_ID)]
+        data_t = np.where(link['ok'], link['current'], 0).astype(float)
         
         self.plot_torque(data_t)
-        self.impact.diff(data_t)
-        result = self.impact.impact_check()
-        return result
+        self.impact.publish()
         
     def plot_torque(self, data_t): # 모터 전류값 Plot 해주는 메서드
         # print(data_t)
@@ -397,6 +341,8 @@ class Pose:
 
         self.last_pose = np.append(self.define_pose, self.gripper_open) #pose 초기값(그리퍼 포함)
         self.trajectory = []
+        # 콜백(ROS thread)에서 만든 새 trajectory -> 제어 thread (lock 없이 참조만 전달, receive()에서 교체)
+        self.setpoints = Mailbox()
         self.state_done_topic = rospy.Publisher('/state_done', Bool, queue_size=10) # to master
         self.change_para = 1024/90
         self.state_done_okay = False
@@ -413,8 +359,7 @@ class Pose:
 
         if data.data == 'previous':
             print('previous')
-            self.trajectory = self.trajectory[:1, :]
-            self.trajectory[0] = self.last_pose
+            self.setpoints.put(np.array([self.last_pose])) # 현재 자세 1개짜리 trajectory
             rospy.sleep(0.1) # trjectory 최신화 될때 까지 기달
             self.stop_state = False
              
@@ -427,7 +372,6 @@ class Pose:
             self.stop_state = False            
 
     def callback_goal(self, msg):
-        self.state_done_okay = False
         self.goal_pose = np.array(msg.data)
         # 원래 알고리즘 상 현재 pose 를 기준으로 계산을 하는 거라 current pose로 넣어두긴 했는데
         # trajectory에 goal이 밀려 있는 상태에서 계산하면 문제가 발생할 수 있을 거 같습니다
@@ -435,14 +379,15 @@ class Pose:
         print('### callback_goal ###')
         print('현재 상태 : ', self.last_pose[:5])
         print('목표 상태 : ', self.goal_pose)
-        self.trajectory = cubic_trajectory(self.last_pose[:5], self.goal_pose)
-        grip_arr = np.full((self.trajectory.shape[0], 1), self.last_pose[5])
-        self.trajectory = np.hstack((self.trajectory, grip_arr))
+        trajectory = cubic_trajectory(self.last_pose[:5], self.goal_pose)
+        grip_arr = np.full((trajectory.shape[0], 1), self.last_pose[5])
+        self.setpoints.put(np.hstack((trajectory, grip_arr)))
+        # trajectory를 넘긴 뒤에 해제 (이전 trajectory 마지막 점에서 state_done이 다시 나가지 않도록)
+        self.state_done_okay = False
         # print(self.trajectory)
         # self.trajectory = np.append(self.trajectory, cubic_trajectory(self.last_pose, self.goal_pose))
         
     def callback_grip(self, msg):
-        self.state_done_okay = False
         self.grip_seperation = msg.data
         goal_grip_seperation = self.gripper_close + (self.grip_seperation - self.gripper_close_mm) * self.seperation_per_mm
 
@@ -453,8 +398,9 @@ class Pose:
         goal_grip_seperation = int(goal_grip_seperation)
         grip_value_arr = np.linspace(self.current_grip_seperation, goal_grip_seperation, N_grip)
         grip_value_arr = grip_value_arr.astype(int)
-        self.trajectory = np.tile(self.last_pose[:5], (N_grip, 1))
-        self.trajectory = np.column_stack((self.trajectory, grip_value_arr)) 
+        trajectory = np.tile(self.last_pose[:5], (N_grip, 1))
+        self.setpoints.put(np.column_stack((trajectory, grip_value_arr)))
+        self.state_done_okay = False
         self.current_grip_seperation = goal_grip_seperation
 
     def state_done(self): # link, gripper 제어 완료 시 state_done 토픽 발행해주는 메서드
@@ -465,6 +411,11 @@ class Pose:
         self.state_done_okay = True
 
 
+    def receive(self): # 제어 thread에서 호출: 콜백이 보낸 새 trajectory가 있으면 교체
+        trajectory = self.setpoints.take()
+        if trajectory is not None:
+            self.trajectory = trajectory
+
     def pose_update(self):
         if len(self.trajectory) > 1: # trajectory 대기열에 2개 이상 존재 시 가장 앞 값을 last_pose에 넣고 해당 값을 삭제.
             
@@ -480,28 +431,33 @@ class Pose:
             pass
 
 def main(data):
-    rate = rospy.Rate(15)
     print('motor_control_node is started')
     dynamixel = DynamixelNode()
     pose = Pose(data.data)
-    impact = Impact()
     define_pose = data.data # (,5)
     define_pose = np.append(define_pose, pose.gripper_open) #pose 초기값(그리퍼 포함)
     dynamixel.move_current_to_goal(define_pose) # 초기 실행 시, 임의의 자세에서 last_pose로 이동. 이때 last_pose는 초기 pose임
     pose.state_done()
-    # t = time.time()
-    while not rospy.is_shutdown():
-        
-        impact_state = dynamixel.monitor_current()
-        if impact_state == 1:
-            pose.stop_state = True 
-            impact.impact_to_gui.publish(True)
-
-        dynamixel.pub_pose(pose.last_pose) # 계속 last_pose로 모터 작동
-        if pose.stop_state == False: # stop이 아니면 pose update
-            pose.pose_update()
 
-        rate.sleep()
+    # 제어 loop 주기/overrun/jitter (data 순서: LOOP_STATS_FIELDS)
+    command_stats_pub = rospy.Publisher('/motor_control/command_loop_stats', fl, queue_size=1)
+    supervision_stats_pub = rospy.Publisher('/motor_control/supervision_loop_stats', fl, queue_size=1)
+
+    def publish_stats(stats):
+        command_stats_pub.publish(fl(data=[float(stats['command'][k]) for k in LOOP_STATS_FIELDS]))
+        supervision_stats_pub.publish(fl(data=[float(stats['supervision'][k]) for k in LOOP_STATS_FIELDS]))
+        rospy.loginfo_throttle(10, "control loop: {}".format(stats))
+
+    # command/state thread (~control_rate, bus는 이 thread만 사용) + 충돌 감지/telemetry thread
+    # trajectory는 기존과 같이 ~trajectory_rate (15 Hz)마다 한 점씩 진행
+    executive = ControlExecutive(dynamixel, pose,
+                                 on_impact=lambda: dynamixel.impact.impact_to_gui.publish(True),
+                                 publish_stats=publish_stats,
+                                 control_rate=rospy.get_param('~control_rate', 100.0),
+                                 trajectory_rate=rospy.get_param('~trajectory_rate', 15.0),
+                                 supervision_rate=rospy.get_param('~supervision_rate', 15.0))
+    executive.start()
+    executive.join(rospy.is_shutdown)
 
 if __name__ == '__main__':
     try:
@@ -3,8 +3,8 @@
 
 import rospy
 from std_msgs.msg import Float32MultiArray as fl
-from std_msgs.msg import Bool, String
-from sensor_msgs.msg import Image as Im
+from std_msgs.msg import Bool, String, Int32
+from sensor_msgs.msg import CompressedImage
 from soomac.msg import image
 from soomac.srv import DefineTask, DefineTaskResponse
 
@@ -16,11 +16,11 @@ from PIL import Image, ImageTk, ImageEnhance
 Image.ANTIALIAS = Image.LANCZOS
 
 import time
+import threading
 import pygame  # pygame 라이브러리 추가
 import customtkinter as ctk
 import tkinter as tk
 import cv2
-from cv_bridge import CvBridge
 import pyrealsense2 as rs
 import numpy as np
 import matplotlib
@@ -57,7 +57,7 @@ class Robot_control:
         rospy.Subscriber('/impact_to_gui', Bool, self.impact_cb)
         rospy.Subscriber('/define_ready', Bool, self.define_ready_test)
         rospy.Subscriber('/camera_ready', Bool, self.camera_ready_test)
-        rospy.Subscriber('/rgb_frame', Im, self.rgb_callback)
+        rospy.Subscriber('/rgb_frame/compressed', CompressedImage, self.rgb_callback, queue_size=1)
         # rospy.Subscriber('/depth_frame', Im, self.depth_callback)
         
         # gui msg type 정의
@@ -72,10 +72,8 @@ class Robot_control:
 
     def rgb_callback(self, image):
         global rgb_frame
-        image.encoding = 'bgr8'
-        bridge = CvBridge()
-        # Convert ROS Image message to OpenCV image
-        rgb_frame = bridge.imgmsg_to_cv2(image, "bgr8")
+        # jpeg preview -> OpenCV BGR image
+        rgb_frame = cv2.imdecode(np.frombuffer(image.data, np.uint8), cv2.IMREAD_COLOR)
 
     def tailor(self, task_name):
         rospy.wait_for_service('define_task')
@@ -576,6 +574,8 @@ def open_task_definition():
 
 def open_camera_window(save_path, task_name):
     save_img_pub = rospy.Publisher('/save_img', image, queue_size=10)
+    # 재촬영/초기화 시 task_tailor의 미리 처리된 결과 무효화 (이 번호부터)
+    invalidate_pub = rospy.Publisher('/define_invalidate', Int32, queue_size=10)
     camera_window = ctk.CTkToplevel()
     camera_window.title("카메라 뷰")
     camera_window.geometry(f"{int(800)}x{int(600)}+650+200")
@@ -599,7 +599,7 @@ def open_camera_window(save_path, task_name):
         global image_count
         color_path = f"{save_path}/{task_name}_color_{image_count}.png"
         depth_path = f"{save_path}/{task_name}_depth_{image_count}.png"
-        npy_path = f"{save_path}/{task_name}_npy_{image_count}.npy"
+        npy_path = f"{save_path}/{task_name}_capture_{image_count}.npz"
 
         path_list = image()
         path_list.color = color_path
@@ -615,6 +615,7 @@ def open_camera_window(save_path, task_name):
     def retake_image():
         global image_count
         image_count -= 1
+        invalidate_pub.publish(Int32(data=max(image_count, 0)))
         print(f"{image_count} 사진이 삭제되었습니다")
 
     def reset_task_images():
@@ -625,6 +626,22 @@ def open_camera_window(save_path, task_name):
         print("모든 사진이 삭제되었습니다")
 
         image_count = 0
+        invalidate_pub.publish(Int32(data=0))
+
+    def complete_task():
+        # define_task는 별도 thread에서 호출, UI는 멈추지 않고 끝나면 다음 창으로
+        complete_button.configure(state="disabled", text="정의 중")
+        tailor_thread = threading.Thread(target=robot_arm.tailor, args=(task_name,), daemon=True)
+        tailor_thread.start()
+
+        def wait_tailor():
+            if tailor_thread.is_alive():
+                camera_window.after(100, wait_tailor)
+                return
+            with_sound(ask_to_execute)()
+            camera_window.destroy()
+
+        wait_tailor()
 
     update_frame()
 
@@ -640,7 +657,7 @@ def open_camera_window(save_path, task_name):
     reset_button = ctk.CTkButton(button_frame, text="초기화", font=ctk.CTkFont(size=int(30)), command=with_sound(reset_task_images), width=int(100*1.4))
     reset_button.grid(row=0, column=2, padx=int(10*1.4))
 
-    complete_button = ctk.CTkButton(button_frame, text="완료", font=ctk.CTkFont(size=int(30)), command=lambda:[robot_arm.tailor(task_name), with_sound(ask_to_execute)(), camera_window.destroy()], width=int(100*1.4))
+    complete_button = ctk.CTkButton(button_frame, text="완료", font=ctk.CTkFont(size=int(30)), command=complete_task, width=int(100*1.4))
     complete_button.grid(row=0, column=3, padx=int(10*1.4))
 
     def on_closing():
@@ -3,7 +3,8 @@
 
 import rospy
 
-from std_msgs.msg import String
+from std_msgs.msg import String, Int32
+from soomac.msg import image
 from soomac.srv import DefineTask, DefineTaskResponse
 
 import os
@@ -12,9 +13,12 @@ os.environ['CUDA_VISIBLE_DEVICES'] = "0" # TODO: Change this if you have more th
 import sys
 sys.path.append(os.path.dirname(__file__))
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import re
 import json
-from time import time
+from time import time, sleep
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
@@ -24,8 +28,9 @@ import torch
 from torch.utils.data import DataLoader
 from torchvision import transforms
 
-from uois.Uois import Uois
-from utils.Seg2Crop import extract_objects_from_image
+from utils.Seg2Crop import extract_objects
+from utils.seg_cache import SegmentationCache
+from utils.segmenter import make_segmenter
 
 from siamese_network.eval import Siamese
 
@@ -35,17 +40,62 @@ from control.camera_transformation import transformation_define
 folder_path = '/home/choiyoonji/catkin_ws/src/soomac/src/gui/Task/'
 
 
+# <task>_capture_<i>.npz (기존: <task>_npy_<i>.npy)
+capture_pattern = re.compile(r'_(?:capture|npy)_(\d+)\.np[yz]$')
+
+
+def capture_index(path):
+    match = capture_pattern.search(path)
+    return int(match.group(1)) if match else None
+
+
+def capture_files(task_path):
+    # 새 형식(.npz)이 있으면 사용, 없으면 기존 .npy. 촬영 번호 순서 (10번 이상도 순서대로)
+    # capture 이름이 아닌 파일 (이전 버전이 task 폴더에 저장한 embedding 등)은 제외
+    files = glob.glob(os.path.join(task_path, '*.npz'))
+    if len(files) == 0:
+        files = glob.glob(os.path.join(task_path, '*.npy'))
+    files = [os.path.normpath(f) for f in files if capture_index(f) is not None]
+    return sorted(files, key=lambda f: (capture_index(f), f))
+
+
 class GUI:
     def __init__(self) -> None:
         name_sub = rospy.Service('define_task', DefineTask, self.path_callback)
         self.task_name = None
 
-        self.uois = Uois()
+        # segmentation backend: 'uois' (network) 또는 'geometric' (CPU, 평면 제거 + connected components)
+        # ~geometric: GeometricSegmenter 파라미터 dictionary
+        self.segmenter = None
+        self.segmenter_config = None
+        self.use_segmenter(rospy.get_param('~segmenter', 'uois'))
+
+        # segmentation + crop 단계 (capture 로드/변환, crop은 병렬, uois 추론은 lock으로 순서대로)
+        self.pool = ThreadPoolExecutor(max_workers=rospy.get_param('~prepare_workers', 2))
+
+        # 촬영할 때마다 background에서 segmentation, crop, embedding (완료 시에는 matching + json만)
+        # capture 경로 -> future of (mtime, cropped_images, crop_feat)
+        self.entries = {}
+        self.entries_lock = threading.Lock()
+        self.capture_timeout = rospy.get_param('~capture_timeout', 10.0)
+
+        # task 폴더별 segmentation/crop 결과 cache (capture 내용 + 파라미터 hash)
+        self.caches = {}
+        self.cache_bytes = int(rospy.get_param('~seg_cache_mb', 256) * 1024 * 1024)
+        save_sub = rospy.Subscriber('/save_img', image, self.capture_callback)
+        invalidate_sub = rospy.Subscriber('/define_invalidate', Int32, self.invalidate_callback)
+
+        # checkpoint weight만 읽고 (ImageNet weight 다운로드 없음) 첫 define_task 전에 warm-up
+        start = time()
         self.siamese = Siamese()
+        load_time = time() - start
+        self.siamese.warmup()
+        rospy.loginfo("Siamese ready: load %.2f s, warm-up %.2f s", load_time, time() - start - load_time)
 
     def path_callback(self, req):
         self.task_name = req.TaskName
-        npy_files = sorted(glob.glob(os.path.join(folder_path+self.task_name, '*.npy')))
+        self.use_segmenter(rospy.get_param('~segmenter', self.segmenter.name))
+        npy_files = capture_files(folder_path+self.task_name)
         print(npy_files)
         # rgb_list = []
         # seg_list = []
@@ -55,16 +105,25 @@ class GUI:
         task["name"] = self.task_name
 
         object_list = []
+        object_feat = None
         coord_list = []
         task_list = []
         step = {'pick': 0, 'place': 0}
 
         print("load")
-
-        for i, img in enumerate(npy_files):
-            rgb, seg = self.uois.run(img, folder_path+self.task_name+'/segmask_'+str(i)+'.png')
-            seg = cv2.imread(folder_path+self.task_name+'/segmask_'+str(i)+'.png', cv2.IMREAD_GRAYSCALE)
-            cropped_images = extract_objects_from_image(rgb, seg)
+        start = time()
+        match_time = 0
+
+        # 촬영 시 이미 처리된 capture는 재사용, 나머지는 pool에 넣고 앞 단계부터 순서대로 matching
+        # (결과는 이미지 순서대로 소비하므로 실행 순서와 무관하게 동일)
+        with self.entries_lock:
+            reused = sum(img in self.entries for img in npy_files)
+        futures = [self.capture_future(img, folder_path+self.task_name+'/segmask_'+str(i)+'.png')
+                   for i, img in enumerate(npy_files)]
+
+        for i, future in enumerate(futures):
+            _, cropped_images, crop_feat = future.result()
+            match_start = time()
             coord = []
 
             if i == 0:
@@ -73,11 +132,18 @@ class GUI:
                     coord.append(img[0])
                     cv2.imwrite(folder_path+self.task_name+f'/object/object_{idx}.png', img[1])
 
-            else:
-                for idx, img in enumerate(object_list):
-                    coord.append(self.object_match(img[1],cropped_images))
+                # 기준 물체 embedding = 첫 이미지 crop의 embedding
+                object_feat = crop_feat
+
+            elif object_feat is not None:
+                coord = self.object_match(object_feat, cropped_images, crop_feat)
 
             coord_list.append(coord)
+            match_time += time() - match_start
+
+        rospy.loginfo("define_task %s: %d images (%d prepared on capture), total %.2f s, matching %.2f s, cache %s",
+                      self.task_name, len(npy_files), reused, time() - start, match_time,
+                      self.cache(folder_path+self.task_name).stats())
 
         print('match')
         task["coords"] = coord_list
@@ -99,6 +165,13 @@ class GUI:
         task["steps"] = task_list
         print('define')
 
+        # 실행 시 재식별용 기준 물체 embedding [N x D] float32 (capture glob에 잡히지 않도록 하위 폴더에)
+        if object_feat is not None:
+            task["embeddings"] = 'embeddings/'+self.task_name+'_embeddings.npy'
+            os.makedirs(folder_path+self.task_name+'/embeddings', exist_ok=True)
+            np.save(folder_path+self.task_name+'/'+task["embeddings"],
+                    object_feat.cpu().numpy().astype(np.float32))
+
         with open(folder_path+self.task_name+'/'+self.task_name+'.json', 'w') as json_file:
             json.dump(task, json_file, ensure_ascii=False, indent=4)
 
@@ -106,16 +179,129 @@ class GUI:
 
         return DefineTaskResponse(True)
 
-    def object_match(self, object_0, crop):
-        max = -1
-        coord = [0,0]
-        for img in crop:
-            similarity = self.siamese.eval(object_0, img[1])
-            if similarity > max:
-                max = similarity
-                coord = img[0]
-  
-        return coord
+    def use_segmenter(self, name):
+        """ segmentation backend 선택. 바뀌면 이전 backend로 만든 결과(진행 중 포함)는 사용하지 않음"""
+        params = rospy.get_param('~geometric', {}) if name == 'geometric' else {}
+        if self.segmenter_config == (name, params):
+            return
+
+        start = time()
+        segmenter = make_segmenter(name, **params)
+        if self.segmenter is not None:
+            with self.entries_lock:
+                self.entries.clear()
+                self.caches.clear()
+        self.segmenter = segmenter
+        self.segmenter_config = (name, params)
+        self.cache_params = {'segmenter': segmenter.name, 'segmenter_params': segmenter.params(),
+                             'crop_offset': 10, 'crop_size': 100}
+        rospy.loginfo("segmenter: %s (%.2f s)", name, time() - start)
+
+    def capture_callback(self, msg):
+        # VisionNode가 같은 메시지로 저장하는 .npz 파일
+        capture_path = os.path.normpath(os.path.splitext(msg.npy)[0] + '.npz')
+        task_path = os.path.dirname(capture_path)
+        index = capture_index(capture_path)
+        segmask_path = os.path.join(task_path, 'segmask_'+str(index)+'.png')
+
+        with self.entries_lock:
+            # 다른 task의 결과는 버림
+            for path in [p for p in self.entries if os.path.dirname(p) != task_path]:
+                del self.entries[path]
+            # 재촬영이면 같은 경로의 이전 결과를 교체 (해당 step만 다시 계산)
+            self.entries[capture_path] = self.pool.submit(self.prepare_capture, capture_path, segmask_path, time())
+
+    def invalidate_callback(self, msg):
+        # 재촬영: 마지막 사진부터, 초기화: 0번부터 결과 삭제
+        with self.entries_lock:
+            for path in [p for p in self.entries if (capture_index(p) or 0) >= msg.data]:
+                del self.entries[path]
+
+    def capture_future(self, capture_path, segmask_path):
+        """ 처리 중이거나 파일이 바뀌지 않은 결과는 그대로, 아니면 새로 처리"""
+        with self.entries_lock:
+            future = self.entries.get(capture_path)
+            if future is None or (future.done() and not self.entry_valid(future, capture_path)):
+                future = self.pool.submit(self.prepare_capture, capture_path, segmask_path)
+                self.entries[capture_path] = future
+            return future
+
+    def entry_valid(self, future, capture_path):
+        if future.exception() is not None or not os.path.exists(capture_path):
+            return False
+        return future.result()[0] == os.path.getmtime(capture_path)
+
+    def prepare_capture(self, capture_path, segmask_path, since=None):
+        """ segmentation + crop + crop embedding 한 capture 분
+
+            @param since: 촬영 메시지를 받은 시간. 주어지면 그 이후에 저장된 파일이 생길 때까지 대기
+                          (재촬영은 같은 경로에 덮어쓰므로 이전 파일을 읽지 않도록)
+
+            @return: (파일 mtime, cropped_images, [K x D] crop embedding 또는 None)
+        """
+        if since is not None:
+            deadline = time() + self.capture_timeout
+            while not os.path.exists(capture_path) or os.path.getmtime(capture_path) < since - 0.5:
+                if time() > deadline:
+                    raise Exception(f"capture {capture_path} was not saved in {self.capture_timeout} s")
+                sleep(0.05)
+
+        mtime = os.path.getmtime(capture_path)
+        # backend가 도중에 바뀌어도 cache key와 segmentation이 같은 backend로
+        segmenter = self.segmenter
+        cache = self.cache(os.path.dirname(capture_path))
+        key = cache.key(capture_path)
+        entry = cache.get(key)
+
+        if entry is not None:
+            # cache hit: segmentation, crop 생략
+            cropped_images = [(coord, crop) for coord, crop in zip(entry['coords'].tolist(), entry['crops'])]
+            if not os.path.exists(segmask_path):
+                cv2.imwrite(segmask_path, entry['mask'])
+            if entry.get('feat') is not None and entry['embed_key'] == self.siamese.model_key:
+                crop_feat = torch.from_numpy(entry['feat']).to(self.siamese.device) if len(cropped_images) > 0 else None
+                return mtime, cropped_images, crop_feat
+            mask = entry['mask']
+            objects = {'coords': entry['coords'], 'crops': entry['crops']}
+        else:
+            objects, mask = self.prepare(capture_path, segmask_path, segmenter)
+            cropped_images = [(coord, crop) for coord, crop in zip(objects['coords'].tolist(), objects['crops'])]
+
+        # crop batch를 그대로 matcher 입력으로
+        crop_feat = None
+        if len(cropped_images) > 0:
+            crop_feat = self.siamese.embed(objects['crops'])
+
+        cache.put(key, mask, objects['coords'], objects['crops'],
+                  None if crop_feat is None else crop_feat.cpu().numpy(), self.siamese.model_key)
+        return mtime, cropped_images, crop_feat
+
+    def cache(self, task_path):
+        with self.entries_lock:
+            if task_path not in self.caches:
+                self.caches[task_path] = SegmentationCache(os.path.join(task_path, 'cache'),
+                                                           self.cache_params, self.cache_bytes)
+            return self.caches[task_path]
+
+    def prepare(self, capture_path, segmask_path, segmenter=None):
+        """ segmentation + crop (pool thread에서 실행). segmask는 파일로 다시 읽지 않고 메모리에서 사용
+
+            @return: extract_objects 결과 (coords, [N x 100 x 100 x 3] crops, ...), [H x W] uint8 label mask
+        """
+        rgb, mask = (segmenter or self.segmenter).segment(capture_path, segmask_path)
+        return extract_objects(rgb, mask), mask
+
+    def object_match(self, object_feat, crop, crop_feat=None):
+        # 기준 물체 N개 x crop K개 유사도를 한번에 계산해서 물체별 가장 비슷한 crop 좌표 선택
+        if len(crop) == 0:
+            return [[0,0] for _ in range(object_feat.shape[0])]
+
+        if crop_feat is None:
+            crop_feat = self.siamese.embed([img[1] for img in crop])
+        similarity = self.siamese.similarity_matrix(object_feat, crop_feat)
+        best = np.argmax(similarity, axis=1)
+
+        return [crop[j][0] for j in best]
 
 
 def main():
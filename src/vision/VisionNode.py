@@ -3,13 +3,13 @@
 
 import rospy
 
-from std_msgs.msg import Bool, String
+from std_msgs.msg import Bool, String, Float32
 from std_msgs.msg import Float32MultiArray as fl
-from sensor_msgs.msg import Image
 from soomac.msg import PickPlace, image
 
 import os
 import sys
+import time
 sys.path.append(os.path.dirname(__file__))
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
@@ -18,13 +18,18 @@ import open3d.core as o3c
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
 import copy
 import json
-from cv_bridge import CvBridge
 
 from realsense.realsense_depth import DepthCamera
-from realsense.utilities import compute_xyz, save_as_npy
+from realsense.utilities import back_project
+from realsense.capture import CaptureWriter
+from realsense.depth_fusion import DepthFusion
+from utils.cluster_stats import cluster_statistics, grasp_poses_from_stats, image_pixels, nearest_cluster
+from utils.Seg2Crop import crop_boxes
+from utils.plane_cache import PlaneModelCache
+from utils.settle_detector import SettleDetector
+from utils.preview_publisher import PreviewPublisher
 
 from control.camera_transformation import transformation_camera
 
@@ -33,16 +38,39 @@ folder_path = '/home/choiyoonji/catkin_ws/src/soomac/src/gui/Task/'
 resolution_width, resolution_height = (640, 480)
 clip_distance_max = 10.00
 
+# ROI 모드 윈도우 크기 (반폭, 픽셀). 군집을 못 찾으면 다음 크기로 키움
+roi_half_sizes = (64, 128, 192)
+# 윈도우 경계에서 이 픽셀 안쪽까지 닿은 군집은 잘린 것으로 봄 (voxel down sampling 오차 포함)
+roi_border = 4
+
 
 class Vision:
     def __init__(self) -> None:
         self.vision_pub = rospy.Publisher('/vision', fl)
-        self.rgb_pub = rospy.Publisher('/rgb_frame', Image)
-        self.depth_pub = rospy.Publisher('/depth_frame', Image)
+        self.preview = PreviewPublisher(scale=rospy.get_param('~preview_scale', 1.0),
+                                        jpeg_quality=rospy.get_param('~preview_jpeg_quality', 80),
+                                        depth_rate=rospy.get_param('~preview_depth_rate', 5.0))
         self.save_sub = rospy.Subscriber('/save_img', image, self.save_callback)
+        self.writer = CaptureWriter()
 
         self.rs = DepthCamera(resolution_width, resolution_height)
+        self.rs.start_capture()
         self.depth_scale = self.rs.get_depth_scale()
+        self.last_pub_timestamp = 0
+
+        self.roi_mode = rospy.get_param('~roi_mode', True)
+        self.roi_count = {'roi': 0, 'grown': 0, 'full': 0}
+
+        # FSM.camera_pose 별로 테이블 평면 저장
+        self.camera_pose_key = rospy.get_param('~camera_pose', '0,210,370,0')
+        self.plane_cache = PlaneModelCache(folder_path+'plane_cache.json',
+                                           distance_threshold=0.01,
+                                           min_inlier_ratio=rospy.get_param('~plane_min_inlier_ratio', 0.5))
+
+        # 정의 시 저장한 기준 물체 embedding으로 군집 재식별 (없으면 픽셀 거리로 선택)
+        self.siamese = None
+        self.reference_feat = None
+        self.reid_threshold = rospy.get_param('~reid_threshold', 0.5)
 
         self.task_name = None
         self.coords = []
@@ -51,34 +79,26 @@ class Vision:
         self.len_step = -1
 
     def save_callback(self, msg):
-        ret, depth_raw_frame, color_raw_frame = self.rs.get_raw_frame()
-        color_frame = np.asanyarray(color_raw_frame.get_data())
-        depth_frame = np.asanyarray(depth_raw_frame.get_data())
-        cv2.imwrite(msg.color, color_frame)
-        plt.imsave(msg.depth, depth_frame)
-
-
-        rgb = cv2.cvtColor(color_frame, cv2.COLOR_BGR2RGB)
-        xyz = compute_xyz(depth_frame * self.depth_scale, self.rs.get_camera_intrinsics())
-
-        data = save_as_npy(rgb, xyz)
+        frame = self.rs.latest()
+        if frame is None:
+            print("Unable to get a frame")
+            return
 
-        np.save(msg.npy, data)
+        # 파일 저장은 background thread에서 (raw depth + color 하나의 .npz)
+        capture_path = os.path.splitext(msg.npy)[0] + '.npz'
+        self.writer.save(capture_path, frame.depth, frame.color,
+                         self.rs.get_camera_intrinsics(), self.depth_scale,
+                         color_path=msg.color, depth_path=msg.depth)
 
     def image_pub(self):
-        bridge = CvBridge()
-        ret, depth_raw_frame, color_raw_frame = self.rs.get_raw_frame()
-        if not ret:
+        # 이미 발행한 프레임이면 다음 프레임까지 대기 (capture thread가 채움)
+        frame = self.rs.wait_newer_than(self.last_pub_timestamp, timeout=0.1)
+        if frame is None:
             print("Unable to get a frame")
             return
+        self.last_pub_timestamp = frame.timestamp
 
-        color_frame = np.asanyarray(color_raw_frame.get_data())
-        depth_frame = np.asanyarray(depth_raw_frame.get_data())
-
-        rgb_image = bridge.cv2_to_imgmsg(color_frame)
-        depth_image = bridge.cv2_to_imgmsg(depth_frame)
-        self.rgb_pub.publish(rgb_image)
-        self.depth_pub.publish(depth_image)
+        self.preview.publish(frame.color, frame.depth)
 
     def load_json(self, task_name):
         self.task_name = task_name
@@ -92,24 +112,61 @@ class Vision:
             self.task = json_data["steps"]
             self.len_step = len(self.task)
 
-    def calc_position(self, object1, object2):
-        ret, depth_raw_frame, color_raw_frame = self.rs.get_raw_frame()
-        depth_frame = np.asanyarray(depth_raw_frame.get_data())
-        plt.imsave(folder_path+'test.png', depth_frame)
-        
-        camera_intrinsics = self.rs.get_camera_intrinsics()  # 카메라 내부 파라미터 가져오기
-        fx = camera_intrinsics['fx']
-        fy = camera_intrinsics['fy']
-        cx = camera_intrinsics['x_offset']
-        cy = camera_intrinsics['y_offset']
-        xyz = compute_xyz(depth_frame * self.depth_scale, camera_intrinsics).reshape((-1,3))
+            self.reference_feat = None
+            if "embeddings" in json_data:
+                self.load_embeddings(folder_path+'/'+task_name+'/'+json_data["embeddings"])
+
+    def load_embeddings(self, path):
+        if not os.path.exists(path):
+            rospy.logwarn("embedding file %s not found, using pixel coordinates", path)
+            return
+
+        # torch/Siamese는 embedding을 쓰는 task에서만 로드
+        import torch
+        if self.siamese is None:
+            from siamese_network.eval import Siamese
+            self.siamese = Siamese()
+            self.siamese.warmup()
+
+        self.reference_feat = torch.from_numpy(np.load(path)).to(self.siamese.device)
+
+    def match_clusters(self, rgb, boxes, object_ids):
+        """ 군집 crop을 한번씩 embedding 해서 기준 물체와의 유사도 계산
+
+            @param rgb: [H x W x 3] RGB 이미지
+            @param boxes: [K x 4] 군집 bounding box
+            @param object_ids: 기준 물체 index 리스트
+
+            @return: [len(object_ids) x K] numpy array
+        """
+        if len(boxes) == 0:
+            return np.zeros((len(object_ids), 0), dtype=np.float32)
+        crop_feat = self.siamese.embed(crop_boxes(rgb, boxes))
+        return self.siamese.similarity_matrix(self.reference_feat[object_ids], crop_feat)
+
+    def segment_clusters(self, xyz, camera_intrinsics, roi=False):
+        """ [N x 3] 포인트 클라우드에서 바닥 평면 제거 후 군집별 Grasp Pose 계산
 
+            @param roi: ROI 윈도우 점이면 저장된 평면과 비교만 하고, 다시 맞춘 평면은 저장하지 않음
+                        (윈도우는 물체 윗면이 대부분일 수 있음)
+
+            @return: grasp_poses 리스트, 각 군집 중심점의 [K x 2] (열, 행) 이미지 픽셀 좌표,
+                     [K x 4] (x0, y0, x1, y1) 이미지 bounding box
+        """
         pcd = o3d.t.geometry.PointCloud(o3c.Tensor(xyz, o3c.float32))
         downpcd = pcd.voxel_down_sample(voxel_size=0.005)
 
-        plane_model, inliers = downpcd.segment_plane(distance_threshold=0.01,
-                                                    ransac_n=3,
-                                                    num_iterations=500)
+        def ransac():
+            plane_model, inliers = downpcd.segment_plane(distance_threshold=0.01,
+                                                        ransac_n=3,
+                                                        num_iterations=500)
+            return plane_model.numpy(), inliers.numpy()
+
+        # 같은 camera pose에서는 저장된 평면을 재사용, 맞지 않을 때만 RANSAC (전체 프레임만 저장)
+        plane_model, inliers = self.plane_cache.segment(self.camera_pose_key,
+                                                        downpcd.point.positions.numpy(), ransac,
+                                                        store=not roi)
+        inliers = o3c.Tensor(inliers)
 
         inlier_cloud = downpcd.select_by_index(inliers)
         outlier_cloud = downpcd.select_by_index(inliers, invert=True)
@@ -120,61 +177,113 @@ class Vision:
         min_cluster_size = 50  # 최소 군집 크기
         max_cluster_size = 1000  # 최대 군집 크기
 
-        # 군집 레이블별 포인트 개수를 계산
-        unique_labels, counts = np.unique(labels, return_counts=True)
-
-        # 필터링된 군집의 중심점 및 PCA 결과 저장할 리스트
-        centroids = []
-        grasp_poses = []
-        pick_ind = -1
-        pick_min = 9999
-        place_ind = -1
-        place_min = 9999
-
-        for label, count in zip(unique_labels, counts):
-            if min_cluster_size <= count <= max_cluster_size:
-                # 해당 군집의 포인트만 선택
-                cluster_points = outlier_cloud.select_by_index(np.where(labels == label)[0])
-                
-                # 중심점 계산
-                centroid = np.mean(cluster_points.point.positions.numpy(), axis=0)
-                centroids.append(centroid)
-
-                X, Y, Z = centroid
-                u = (X * fx) / Z + cx
-                v = (Y * fy) / Z + cy
-
-                pixel = np.array([u,v])
-                print(pixel, object1, object2)
-
-                dis = np.linalg.norm(pixel-object1)
-                if dis < pick_min:
-                    pick_ind = len(centroids)-1
-                    pick_min = dis
-
-                dis = np.linalg.norm(pixel-object2)
-                if dis < place_min:
-                    place_ind = len(centroids)-1
-                    place_min = dis
-                
-                # PCA를 통해 Grasp Pose 계산
-                pca = PCA(n_components=3)
-                pca.fit(cluster_points.point.positions.numpy())
-                aabb = cluster_points.get_axis_aligned_bounding_box()
-                aabb_extent = aabb.get_extent()  # 각 축에 대한 길이 (폭, 높이, 깊이)
-                gripper_width = aabb_extent[0]  # Grasp 방향(주축)으로의 폭
-                
-                # PCA 주성분을 Grasp Pose로 사용
-                principal_axes = pca.components_
-                grasp_pose = {
-                    'position': centroid,
-                    'principal_axis': principal_axes[0],  # 주축 (Grasp 방향)
-                    'secondary_axis': principal_axes[1],  # 수평축 (회전 정의)
-                    'normal_axis': principal_axes[2],      # 법선축
-                    'theta':  np.arctan2(principal_axes[0][1], principal_axes[0][0]),
-                    'grasp_width': gripper_width*1000
-                }
-                grasp_poses.append(grasp_pose)
+        # 모든 군집의 중심점, PCA, AABB를 한번에 계산
+        stats = cluster_statistics(outlier_cloud.point.positions.numpy(), labels.numpy(),
+                                   min_cluster_size, max_cluster_size, camera_intrinsics)
+        grasp_poses = grasp_poses_from_stats(stats)
+
+        # 중심점을 이미지 픽셀로 투영 (행은 위에서부터, box와 같은 좌표계)
+        pixels = image_pixels(stats['centroid'], camera_intrinsics)
+
+        return grasp_poses, pixels, stats['box']
+
+    def roi_position(self, xyz_img, camera_intrinsics, target, rgb=None, object_id=None):
+        """ target 물체 주변 윈도우만 처리. 물체를 찾지 못하면 윈도우를 키워서 다시 시도
+
+            target은 정의 시 기록한 bounding box 좌상단 (x, y)이므로 윈도우는 그 오른쪽 아래로 잡음.
+            윈도우 경계에 닿은 군집은 잘린 물체일 수 있으므로 사용하지 않음 (이미지 경계는 제외)
+            rgb, object_id가 주어지면 embedding 유사도가 가장 높은 군집을 선택하고,
+            reid_threshold 미만이면 윈도우를 키움
+
+            @return: (grasp_pose or None, 키운 윈도우를 사용했는지 여부)
+        """
+        height, width = xyz_img.shape[:2]
+        x, y = int(target[0]), int(target[1])
+
+        for i, half in enumerate(roi_half_sizes):
+            # 좌상단에서 half/2 만큼 오른쪽 아래가 윈도우 중심 (최대 1.5 half 크기의 물체까지 윈도우 안)
+            cx, cy = x + half // 2, y + half // 2
+            u0, u1 = max(0, cx-half), min(width, cx+half)
+            v0, v1 = max(0, cy-half), min(height, cy+half)
+            if (u1 - u0) * (v1 - v0) < 3:
+                continue
+
+            window = xyz_img[v0:v1, u0:u1].reshape((-1,3))
+            grasp_poses, pixels, boxes = self.segment_clusters(window, camera_intrinsics, roi=True)
+
+            # 이미지 경계가 아닌 윈도우 경계에 닿은 군집
+            cut = np.zeros(len(boxes), dtype=bool)
+            if u0 > 0:
+                cut |= boxes[:, 0] <= u0 + roi_border
+            if u1 < width:
+                cut |= boxes[:, 2] >= u1 - 1 - roi_border
+            if v0 > 0:
+                cut |= boxes[:, 1] <= v0 + roi_border
+            if v1 < height:
+                cut |= boxes[:, 3] >= v1 - 1 - roi_border
+
+            if object_id is None:
+                if len(grasp_poses) == 0:
+                    continue
+                # 정의 시 좌표와 같은 bounding box 좌상단끼리 비교, 가장 가까운 군집이 잘렸으면 윈도우를 키움
+                nearest = nearest_cluster(boxes[:, :2], target)
+                if not cut[nearest]:
+                    return grasp_poses[nearest], i > 0
+                continue
+
+            inside = np.nonzero(~cut)[0]
+            if len(inside) == 0:
+                continue
+            similarity = self.match_clusters(rgb, boxes[inside], [object_id])[0]
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.reid_threshold:
+                return grasp_poses[inside[best]], i > 0
+
+        return None, True
+
+    def calc_position(self, object1, object2, frame=None, object_ids=None):
+        if frame is None:
+            frame = self.rs.latest()
+        depth_frame = frame.depth
+        plt.imsave(folder_path+'test.png', depth_frame)
+        
+        camera_intrinsics = self.rs.get_camera_intrinsics()  # 카메라 내부 파라미터 가져오기
+        xyz_img = back_project(depth_frame, camera_intrinsics, self.depth_scale)
+
+        # 기준 embedding이 있으면 물체 id로 재식별 (crop은 정의 시와 같은 RGB 입력)
+        rgb = None
+        if self.reference_feat is None:
+            pick_id, place_id = None, None
+        else:
+            pick_id, place_id = object_ids
+            rgb = cv2.cvtColor(frame.color, cv2.COLOR_BGR2RGB)
+
+        # ROI 모드: pick/place 픽셀 주변만 처리
+        if self.roi_mode:
+            pick, pick_grown = self.roi_position(xyz_img, camera_intrinsics, object1, rgb, pick_id)
+            place, place_grown = None, True
+            if pick is not None:
+                place, place_grown = self.roi_position(xyz_img, camera_intrinsics, object2, rgb, place_id)
+
+            if pick is not None and place is not None:
+                self.roi_count['grown' if pick_grown or place_grown else 'roi'] += 1
+                rospy.loginfo("calc_position path count : %s", self.roi_count)
+                return pick, place
+
+        # 전체 프레임 처리 (fallback)
+        self.roi_count['full'] += 1
+        rospy.loginfo("calc_position path count : %s", self.roi_count)
+
+        grasp_poses, pixels, boxes = self.segment_clusters(xyz_img.reshape((-1,3)), camera_intrinsics)
+
+        if pick_id is not None and len(grasp_poses) > 0:
+            # 군집 crop embedding 한번 + 기준 embedding과 [2 x K] 유사도
+            similarity = self.match_clusters(rgb, boxes, [pick_id, place_id])
+            pick_ind, place_ind = np.argmax(similarity, axis=1)
+        else:
+            # 정의 시 좌표 (bounding box 좌상단)와 가장 가까운 군집 선택
+            pick_ind = nearest_cluster(boxes[:, :2], object1)
+            place_ind = nearest_cluster(boxes[:, :2], object2)
 
 
         # 결과 출력
@@ -226,13 +335,14 @@ class Vision:
         return grasp_poses[pick_ind], grasp_poses[place_ind]
 
 
-    def coord_pub(self):
+    def coord_pub(self, frame=None):
         self.step %= self.len_step
         current_step = self.task[self.step]
     
         object1 = self.coords[0][current_step["pick"]]
         object2 = self.coords[0][current_step["place"]]
-        pick, place = self.calc_position(object1, object2)
+        pick, place = self.calc_position(object1, object2, frame,
+                                         (current_step["pick"], current_step["place"]))
 
         pick_position = np.array(pick["position"], dtype=float)*1000
         place_position = np.array(place["position"], dtype=float)*1000
@@ -245,7 +355,7 @@ class Vision:
 
         coord = fl()
         coord.data = [pick_position[0], pick_position[1], pick_position[2],
-                      float(pick["theta"]), np.float32(pick["grasp_width"].numpy()),
+                      float(pick["theta"]), np.float32(pick["grasp_width"]),
                       -place_position[0], place_position[1], place_position[2],
                       float(place["theta"])]
         self.vision_pub.publish(coord)
@@ -267,6 +377,20 @@ class Info:
         task_sub = rospy.Subscriber('/task_complete', Bool, self.task_callback)
 
         self.robot_pub = rospy.Publisher('/camera_pose', Bool)
+        self.settle_pub = rospy.Publisher('/settle_time', Float32, queue_size=10)
+
+        # 고정 sleep(5) 대신 depth 변화가 멈추면 바로 인식 시작
+        self.settle = SettleDetector(self.vision.rs, self.vision.depth_scale,
+                                     threshold=rospy.get_param('~settle_threshold', 0.003),
+                                     stable_frames=rospy.get_param('~settle_frames', 3),
+                                     timeout=rospy.get_param('~settle_timeout', 5.0))
+
+        # 정지 구간의 depth 프레임을 합쳐서 노이즈 감소 (0이면 단일 프레임 사용)
+        fusion_frames = rospy.get_param('~fusion_frames', 4)
+        self.fusion = None
+        if fusion_frames > 1:
+            self.fusion = DepthFusion(resolution_height, resolution_width, n=fusion_frames,
+                                      method=rospy.get_param('~fusion_method', 'median'))
 
         self.task_name = None
         self.robot_ready = False
@@ -279,9 +403,16 @@ class Info:
         self.vision.load_json(self.task_name)
 
     def robot_callback(self, msg):
+        since = time.time()
         self.task_name = msg.data
-        rospy.sleep(5)
-        self.vision.coord_pub()
+        frame, settle_time, settled = self.settle.wait(since, self.fusion)
+        if not settled:
+            rospy.logwarn("scene did not settle in %.1f s", settle_time)
+        self.settle_pub.publish(Float32(data=settle_time))
+
+        if settled and self.fusion is not None:
+            frame = frame._replace(depth=self.fusion.fuse().copy())
+        self.vision.coord_pub(frame)
 
     def task_callback(self, msg):
         self.task_name = msg.data
@@ -0,0 +1,83 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from time import perf_counter
+
+import numpy as np
+import open3d as o3d
+import open3d.core as o3c
+from sklearn.decomposition import PCA
+
+from realsense.utilities import compute_xyz
+from utils.cluster_stats import cluster_statistics, grasp_poses_from_stats
+from scenes import load_recorded_scenes, camera_intrinsics
+
+
+def loop_cluster_stats(outlier_cloud, labels, min_cluster_size=50, max_cluster_size=1000):
+    # 기존 Vision.calc_position 의 군집별 루프
+    unique_labels, counts = np.unique(labels, return_counts=True)
+    grasp_poses = []
+    for label, count in zip(unique_labels, counts):
+        if min_cluster_size <= count <= max_cluster_size:
+            cluster_points = outlier_cloud.select_by_index(np.where(labels == label)[0])
+            centroid = np.mean(cluster_points.point.positions.numpy(), axis=0)
+
+            pca = PCA(n_components=3)
+            pca.fit(cluster_points.point.positions.numpy())
+            aabb = cluster_points.get_axis_aligned_bounding_box()
+            aabb_extent = aabb.get_extent()
+
+            principal_axes = pca.components_
+            grasp_poses.append({
+                'position': centroid,
+                'principal_axis': principal_axes[0],
+                'secondary_axis': principal_axes[1],
+                'normal_axis': principal_axes[2],
+                'theta':  np.arctan2(principal_axes[0][1], principal_axes[0][0]),
+                'grasp_width': aabb_extent[0].item()*1000
+            })
+    return grasp_poses
+
+
+def batched_cluster_stats(outlier_cloud, labels, min_cluster_size=50, max_cluster_size=1000):
+    stats = cluster_statistics(outlier_cloud.point.positions.numpy(), labels, min_cluster_size, max_cluster_size)
+    return grasp_poses_from_stats(stats)
+
+
+def timeit(func, *args, repeat=10):
+    times = []
+    for _ in range(repeat):
+        t = perf_counter()
+        result = func(*args)
+        times.append(perf_counter() - t)
+    return result, np.median(times)
+
+
+if __name__ == "__main__":
+    scenes = load_recorded_scenes()
+    print("{:>5} {:>8} {:>9} {:>10} {:>10} {:>8} {:>10}".format(
+        "scene", "points", "clusters", "loop[ms]", "batch[ms]", "speedup", "max_err"))
+
+    for i, (color, depth) in enumerate(scenes):
+        xyz = compute_xyz(depth, camera_intrinsics).reshape((-1, 3))
+        pcd = o3d.t.geometry.PointCloud(o3c.Tensor(xyz, o3c.float32))
+        downpcd = pcd.voxel_down_sample(voxel_size=0.005)
+        plane_model, inliers = downpcd.segment_plane(distance_threshold=0.01, ransac_n=3, num_iterations=500)
+        outlier_cloud = downpcd.select_by_index(inliers, invert=True)
+        labels = outlier_cloud.cluster_dbscan(eps=0.01, min_points=10).numpy()
+
+        loop_poses, loop_t = timeit(loop_cluster_stats, outlier_cloud, labels)
+        batch_poses, batch_t = timeit(batched_cluster_stats, outlier_cloud, labels)
+
+        max_err = 0.
+        for a, b in zip(loop_poses, batch_poses):
+            max_err = max(max_err,
+                          np.abs(a['position'] - b['position']).max(),
+                          np.abs(a['principal_axis'] - b['principal_axis']).max(),
+                          abs(a['grasp_width'] - b['grasp_width']) / 1000)
+        assert len(loop_poses) == len(batch_poses)
+
+        print("{:>5} {:>8} {:>9} {:>10.2f} {:>10.2f} {:>7.1f}x {:>10.2e}".format(
+            i, len(labels), len(batch_poses), loop_t*1000, batch_t*1000, loop_t/max(batch_t, 1e-9), max_err))
@@ -0,0 +1,99 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from time import perf_counter
+
+import numpy as np
+import open3d as o3d
+import open3d.core as o3c
+
+from realsense.utilities import back_project
+from realsense.depth_fusion import DepthFusion
+from utils.cluster_stats import cluster_statistics
+from scenes import load_recorded_scenes, camera_intrinsics
+
+
+depth_scale = 0.001
+n_frames = 4        # 합칠 프레임 수
+n_trials = 10       # 장면당 반복 횟수
+
+
+def noisy_frames(depth, n, rng, sigma_at_1m=0.004, dropout=0.02):
+    """ RealSense like noise: std grows with z^2, random holes."""
+    frames = []
+    for _ in range(n):
+        noise = rng.normal(size=depth.shape) * sigma_at_1m * depth**2
+        d = np.clip((depth + noise) / depth_scale, 0, 65535).astype(np.uint16)
+        d[depth == 0] = 0
+        d[rng.random(depth.shape) < dropout] = 0
+        frames.append(d)
+    return frames
+
+
+def ransac_iterations(inlier_ratio, p=0.99, ransac_n=3):
+    """ Number of RANSAC iterations to hit an all-inlier sample with probability p."""
+    w = min(max(inlier_ratio, 1e-6), 1 - 1e-9)
+    return np.log(1 - p) / np.log(1 - w**ransac_n)
+
+
+def perceive(depth):
+    xyz = back_project(depth, camera_intrinsics, depth_scale).reshape((-1, 3))
+    pcd = o3d.t.geometry.PointCloud(o3c.Tensor(xyz, o3c.float32))
+    downpcd = pcd.voxel_down_sample(voxel_size=0.005)
+    plane_model, inliers = downpcd.segment_plane(distance_threshold=0.01, ransac_n=3, num_iterations=500)
+    outlier_cloud = downpcd.select_by_index(inliers, invert=True)
+    labels = outlier_cloud.cluster_dbscan(eps=0.01, min_points=10).numpy()
+
+    stats = cluster_statistics(outlier_cloud.point.positions.numpy(), labels)
+    inlier_ratio = inliers.shape[0] / max(downpcd.point.positions.shape[0], 1)
+    return inlier_ratio, stats['centroid']
+
+
+def centroid_jitter(runs):
+    """ Mean distance [mm] of each run's centroids to the nearest centroid of the first run."""
+    ref = runs[0]
+    if len(ref) == 0:
+        return np.nan
+    dists = []
+    for centroids in runs[1:]:
+        if len(centroids) == 0:
+            continue
+        d = np.linalg.norm(centroids[:, None, :] - ref[None, :, :], axis=2).min(axis=1)
+        dists.append(d.mean())
+    return np.mean(dists) * 1000 if dists else np.nan
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    scenes = load_recorded_scenes()
+    fusion = DepthFusion(camera_intrinsics['img_height'], camera_intrinsics['img_width'], n=n_frames)
+
+    print("{:>5} {:>7} {:>10} {:>10} {:>10} {:>10} {:>11} {:>10}".format(
+        "scene", "input", "inlier", "ransac_it", "clusters", "std", "jitter[mm]", "fuse[ms]"))
+
+    for i, (color, depth) in enumerate(scenes):
+        results = {'single': ([], [], []), 'fused': ([], [], [])}
+        fuse_times = []
+        for _ in range(n_trials):
+            frames = noisy_frames(depth, n_frames, rng)
+
+            fusion.reset()
+            for d in frames:
+                fusion.add(d)
+            t = perf_counter()
+            fused = fusion.fuse().copy()
+            fuse_times.append(perf_counter() - t)
+
+            for key, d in (('single', frames[-1]), ('fused', fused)):
+                ratio, centroids = perceive(d)
+                results[key][0].append(ratio)
+                results[key][1].append(len(centroids))
+                results[key][2].append(centroids)
+
+        for key, (ratios, counts, centroids) in results.items():
+            print("{:>5} {:>7} {:>10.3f} {:>10.1f} {:>10.1f} {:>10.2f} {:>11.2f} {:>10}".format(
+                i, key, np.mean(ratios), ransac_iterations(np.mean(ratios)),
+                np.mean(counts), np.std(counts), centroid_jitter(centroids),
+                "{:.2f}".format(np.median(fuse_times)*1000) if key == 'fused' else "-"))
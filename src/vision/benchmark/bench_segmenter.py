@@ -0,0 +1,128 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+import re
+import glob
+from time import perf_counter
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from realsense.capture import load_capture
+from realsense.utilities import back_project
+from utils.segmenter import GeometricSegmenter
+from scenes import load_recorded_scenes, camera_intrinsics
+
+
+task_root = '/home/choiyoonji/catkin_ws/src/soomac/src/gui/Task/'
+capture_pattern = re.compile(r'_(?:capture|npy)_(\d+)\.np[yz]$')
+n_trials = 10
+
+
+def stored_pairs(root):
+    """ (capture 경로, UOIS segmask 경로) 목록. TaskTailor_srv와 같이 i번째 capture <-> segmask_i.png"""
+    pairs = []
+    for task_path in sorted(glob.glob(os.path.join(root, '*'))):
+        files = glob.glob(os.path.join(task_path, '*.npz')) or glob.glob(os.path.join(task_path, '*.npy'))
+        files = sorted([f for f in files if capture_pattern.search(f)],
+                       key=lambda f: int(capture_pattern.search(f).group(1)))
+        for i, capture_path in enumerate(files):
+            segmask_path = os.path.join(task_path, 'segmask_'+str(i)+'.png')
+            if os.path.exists(segmask_path):
+                pairs.append((capture_path, segmask_path))
+    return pairs
+
+
+def agreement(pred, ref, iou_threshold=0.5):
+    """ Object level agreement of two label masks (0 = background).
+
+        Objects are matched one to one by maximum IoU (Hungarian).
+
+        @return: dictionary with
+                 'fg_iou'  : IoU of the foreground (any object) masks
+                 'mean_iou': mean IoU of the reference objects (unmatched = 0)
+                 'f1'      : F1 of objects matched with IoU >= iou_threshold
+                 'n_pred', 'n_ref': number of objects
+    """
+    pred_labels, pred_index = np.unique(pred, return_inverse=True)
+    ref_labels, ref_index = np.unique(ref, return_inverse=True)
+    n_pred, n_ref = len(pred_labels), len(ref_labels)
+
+    # [ref x pred] 교집합 픽셀 수 (label 0 포함)
+    inter = np.bincount(ref_index.ravel() * n_pred + pred_index.ravel(),
+                        minlength=n_ref * n_pred).reshape(n_ref, n_pred)
+    pred_fg = pred_labels != 0
+    ref_fg = ref_labels != 0
+
+    fg_inter = inter[ref_fg][:, pred_fg].sum()
+    fg_union = inter.sum() - inter[~ref_fg][:, ~pred_fg].sum()
+    result = {'fg_iou': fg_inter / fg_union if fg_union else 1.0,
+              'n_pred': int(pred_fg.sum()), 'n_ref': int(ref_fg.sum())}
+
+    inter = inter[ref_fg][:, pred_fg]
+    if inter.size == 0:
+        empty = result['n_pred'] == result['n_ref'] == 0
+        result.update({'mean_iou': 1.0 if empty else 0.0, 'f1': 1.0 if empty else 0.0})
+        return result
+
+    union = (np.bincount(ref_index.ravel(), minlength=n_ref)[ref_fg][:, None]
+             + np.bincount(pred_index.ravel(), minlength=n_pred)[pred_fg][None, :] - inter)
+    iou = inter / union
+
+    rows, cols = linear_sum_assignment(-iou)
+    matched = iou[rows, cols]
+    tp = np.count_nonzero(matched >= iou_threshold)
+    result['mean_iou'] = matched.sum() / result['n_ref']
+    result['f1'] = 2 * tp / (result['n_pred'] + result['n_ref'])
+    return result
+
+
+def timed(func, *args):
+    func(*args)
+    times = []
+    for _ in range(n_trials):
+        t = perf_counter()
+        out = func(*args)
+        times.append(perf_counter() - t)
+    return out, np.median(times)
+
+
+if __name__ == "__main__":
+    # 사용법: bench_segmenter.py [task 폴더 root (capture + UOIS segmask_<i>.png)]
+    root = sys.argv[1] if len(sys.argv) > 1 else task_root
+    segmenter = GeometricSegmenter()
+
+    pairs = stored_pairs(root)
+    if len(pairs) > 0:
+        print("{} captures with stored UOIS masks in {}".format(len(pairs), root))
+        print("{:>40} {:>10} {:>9} {:>9} {:>7} {:>6} {:>6}".format(
+            "capture", "geo[ms]", "fg_iou", "mean_iou", "f1", "n_geo", "n_uois"))
+
+        results = []
+        for capture_path, segmask_path in pairs:
+            xyz = load_capture(capture_path).xyz
+            ref = cv2.imread(segmask_path, cv2.IMREAD_GRAYSCALE)
+            mask, t = timed(segmenter.label, xyz)
+            r = agreement(mask, ref)
+            r['time'] = t
+            results.append(r)
+            print("{:>40} {:>10.1f} {:>9.3f} {:>9.3f} {:>7.3f} {:>6} {:>6}".format(
+                os.path.relpath(capture_path, root)[-40:], t*1000, r['fg_iou'], r['mean_iou'], r['f1'],
+                r['n_pred'], r['n_ref']))
+
+        print("{:>40} {:>10.1f} {:>9.3f} {:>9.3f} {:>7.3f} {:>6} {:>6}".format(
+            "mean", np.mean([r['time'] for r in results])*1000,
+            np.mean([r['fg_iou'] for r in results]), np.mean([r['mean_iou'] for r in results]),
+            np.mean([r['f1'] for r in results]), "", ""))
+        print("count agreement: {:.3f}".format(np.mean([r['n_pred'] == r['n_ref'] for r in results])))
+    else:
+        # 저장된 UOIS mask가 없으면 녹화 장면으로 시간만 측정
+        print("no stored UOIS masks in {}, timing recorded scenes only".format(root))
+        print("{:>8} {:>10} {:>9}".format("scene", "geo[ms]", "objects"))
+        for i, (color, depth) in enumerate(load_recorded_scenes()):
+            xyz = back_project(depth, camera_intrinsics).copy()
+            mask, t = timed(segmenter.label, xyz)
+            print("{:>8} {:>10.1f} {:>9}".format(i, t*1000, int(mask.max())))
@@ -0,0 +1,59 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'siamese_network'))
+
+import glob
+from time import perf_counter
+
+import numpy as np
+
+import torch
+
+from siamese_network.eval import Siamese
+from siamese_network.backend import onnxruntime_available, load_model
+from bench_siamese_backend import load_pairs, evaluate, val_path
+
+
+model_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network"
+teacher_checkpoint = os.path.join(model_path, "best.pth")
+
+
+if __name__ == "__main__":
+    # 사용법: bench_siamese_backbones.py [val_path] [checkpoint ...]
+    path = sys.argv[1] if len(sys.argv) > 1 else val_path
+    checkpoints = sys.argv[2:] or [teacher_checkpoint] + sorted(glob.glob(os.path.join(model_path, "student_*_best.pth")))
+    backends = ['torch', 'onnx'] if onnxruntime_available() else ['torch', 'torchscript']
+
+    pairs = load_pairs(path)
+    labels = np.array([y for _, _, y in pairs])
+    batch = torch.cat([img1 for img1, _, _ in pairs[:16]])
+
+    print("{} val pairs, 1 cpu thread".format(len(pairs)))
+    print("{:>32} {:>12} {:>10} {:>9} {:>11} {:>9} {:>14} {:>15}".format(
+        "checkpoint", "backend", "params[M]", "accuracy", "teacher_agr", "max_diff", "pair[ms]", "embed x16[ms]"))
+
+    teacher = None
+    for checkpoint in checkpoints:
+        model, backbone = load_model(checkpoint)
+        params = sum(p.numel() for p in model.backbone.parameters()) / 1e6
+
+        for backend in backends:
+            siamese = Siamese(backend=backend, num_threads=1, checkpoint=checkpoint)
+            evaluate(siamese, pairs[:2])
+            probs, times = evaluate(siamese, pairs)
+
+            t = perf_counter()
+            for _ in range(5):
+                siamese.backend.embed(batch)
+            batch_time = (perf_counter() - t) / 5
+
+            if teacher is None:
+                teacher = probs
+            accuracy = np.mean((probs > 0.5) == (labels > 0.5))
+            agreement = np.mean((probs > 0.5) == (teacher > 0.5))
+
+            print("{:>32} {:>12} {:>10.2f} {:>9.3f} {:>11.3f} {:>9.1e} {:>14.2f} {:>15.1f}".format(
+                os.path.basename(checkpoint), backend, params, accuracy, agreement,
+                np.abs(probs - teacher).max(), np.median(times)*1000, batch_time*1000))
@@ -0,0 +1,81 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'siamese_network'))
+
+from time import perf_counter
+
+import numpy as np
+
+import torch
+from torch.utils.data import DataLoader
+
+from siamese_network.eval import Siamese
+from siamese_network.dataset import Dataset
+from siamese_network.backend import onnxruntime_available
+
+
+val_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/val"
+
+# (backend, int8)
+configs = [('torch', False), ('torchscript', False), ('torchscript', True), ('onnx', False), ('onnx', True)]
+thread_counts = (1, 4)
+
+
+def load_pairs(path):
+    # eval.py __main__과 같은 val pair (shuffle_pairs=False로 고정)
+    pairs = []
+    for (img1, img2), y, _ in DataLoader(Dataset(path, shuffle_pairs=False, augment=False), batch_size=1):
+        pairs.append((img1, img2, y.item()))
+    return pairs
+
+
+def evaluate(siamese, pairs):
+    probs = []
+    times = []
+    for img1, img2, _ in pairs:
+        t = perf_counter()
+        prob = siamese.backend.head(siamese.backend.embed(img1), siamese.backend.embed(img2))
+        times.append(perf_counter() - t)
+        probs.append(float(prob[0][0]))
+    return np.array(probs), np.array(times)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else val_path
+    pairs = load_pairs(path)
+    labels = np.array([y for _, _, y in pairs])
+    batch = torch.cat([img1 for img1, _, _ in pairs[:16]])
+
+    print("{} val pairs, {} cpu threads available".format(len(pairs), os.cpu_count()))
+    print("{:>12} {:>5} {:>8} {:>9} {:>10} {:>10} {:>15}".format(
+        "backend", "int8", "threads", "accuracy", "max_diff", "pair[ms]", "embed x16[ms]"))
+
+    reference = None
+    for threads in thread_counts:
+        for backend, quantized in configs:
+            if backend == 'onnx' and not onnxruntime_available():
+                continue
+            try:
+                siamese = Siamese(backend=backend, quantized=quantized, num_threads=threads)
+            except Exception as e:
+                print("{:>12} {:>5} skipped: {}".format(backend, str(quantized), e))
+                continue
+
+            # warm-up
+            evaluate(siamese, pairs[:2])
+            probs, times = evaluate(siamese, pairs)
+
+            t = perf_counter()
+            for _ in range(5):
+                siamese.backend.embed(batch)
+            batch_time = (perf_counter() - t) / 5
+
+            if reference is None:
+                reference = probs
+            accuracy = np.mean((probs > 0.5) == (labels > 0.5))
+
+            print("{:>12} {:>5} {:>8} {:>9.3f} {:>10.1e} {:>10.2f} {:>15.1f}".format(
+                backend, str(quantized), threads, accuracy, np.abs(probs - reference).max(),
+                np.median(times)*1000, batch_time*1000))
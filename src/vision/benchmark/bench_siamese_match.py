@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'siamese_network'))
+
+import glob
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from siamese_network.eval import Siamese
+
+
+crop_path = os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'a', 'cropped')
+
+
+def pairwise_match(siamese, objects, crops):
+    # 기존 TaskTailor_srv.object_match: 물체-crop 쌍마다 Siamese.eval
+    return np.array([[siamese.eval(obj, crop) for crop in crops] for obj in objects])
+
+
+def batched_match(siamese, objects, crops):
+    return siamese.match(objects, crops)
+
+
+def timeit(func, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t = perf_counter()
+        result = func(*args)
+        times.append(perf_counter() - t)
+    return result, np.median(times)
+
+
+if __name__ == "__main__":
+    crops = [cv2.cvtColor(cv2.imread(f), cv2.COLOR_BGR2RGB)
+             for f in sorted(glob.glob(os.path.join(crop_path, '*.png')))]
+    siamese = Siamese()
+
+    # warm-up
+    batched_match(siamese, crops[:1], crops[:1])
+
+    print("{:>8} {:>6} {:>14} {:>13} {:>8} {:>9} {:>10}".format(
+        "objects", "crops", "pairwise[ms]", "batched[ms]", "speedup", "max_err", "same_argmax"))
+
+    for n in (1, 3, 6, len(crops)):
+        objects = crops[:n]
+        loop_sim, loop_t = timeit(pairwise_match, siamese, objects, crops)
+        batch_sim, batch_t = timeit(batched_match, siamese, objects, crops)
+
+        print("{:>8} {:>6} {:>14.1f} {:>13.1f} {:>7.1f}x {:>9.1e} {:>10}".format(
+            n, len(crops), loop_t*1000, batch_t*1000, loop_t/batch_t,
+            np.abs(loop_sim - batch_sim).max(),
+            bool(np.all(loop_sim.argmax(1) == batch_sim.argmax(1)))))
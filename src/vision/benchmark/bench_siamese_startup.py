@@ -0,0 +1,77 @@
+import os
+import sys
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'siamese_network'))
+
+import json
+import subprocess
+from time import perf_counter
+
+import numpy as np
+
+
+checkpoint = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/best.pth"
+
+# 'legacy' : 기존 Siamese.__init__ (pretrained=True 생성 + optimizer state 포함 checkpoint)
+modes = ['legacy', 'torch', 'torchscript', 'onnx']
+
+
+def child(mode):
+    """ 새 프로세스에서 실행: import, 생성, 첫 요청, 두번째 요청 시간 [s]"""
+    result = {}
+    t = perf_counter()
+    import torch
+    from siamese_network.eval import Siamese
+    result['import'] = perf_counter() - t
+
+    images = [np.zeros((100, 100, 3), dtype=np.uint8)] * 6
+
+    t = perf_counter()
+    if mode == 'legacy':
+        from siamese_network.model import SiameseNetwork
+        state = torch.load(checkpoint)
+        model = SiameseNetwork(backbone=state['backbone'])
+        model.load_state_dict(state['model_state_dict'])
+        model.eval()
+        # Siamese.__init__을 거치지 않고 eager backend만 연결
+        from siamese_network.backend import TorchBackend
+        siamese = Siamese.__new__(Siamese)
+        siamese.device = torch.device('cpu')
+        siamese.model = model
+        siamese.backend = TorchBackend(model, siamese.device)
+        result['load'] = perf_counter() - t
+        result['warmup'] = 0.0
+    else:
+        siamese = Siamese(backend=mode)
+        result['load'] = perf_counter() - t
+        t = perf_counter()
+        siamese.warmup()
+        result['warmup'] = perf_counter() - t
+
+    for key in ('first', 'second'):
+        t = perf_counter()
+        siamese.match(images[:2], images)
+        result[key] = perf_counter() - t
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        child(sys.argv[2])
+        sys.exit(0)
+
+    print("{:>12} {:>10} {:>9} {:>11} {:>13} {:>14} {:>15}".format(
+        "mode", "import[s]", "load[s]", "warmup[s]", "1st call[ms]", "2nd call[ms]", "ready+1st[s]"))
+    for mode in modes:
+        start = perf_counter()
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode],
+                              capture_output=True, text=True, timeout=600)
+        elapsed = perf_counter() - start
+        if proc.returncode != 0:
+            print("{:>12} failed after {:.1f} s: {}".format(mode, elapsed, proc.stderr.strip().splitlines()[-1]))
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print("{:>12} {:>10.2f} {:>9.2f} {:>11.2f} {:>13.1f} {:>14.1f} {:>15.2f}".format(
+            mode, r['import'], r['load'], r['warmup'], r['first']*1000, r['second']*1000,
+            r['import'] + r['load'] + r['warmup'] + r['first']))
@@ -0,0 +1,54 @@
+import os
+import glob
+
+import cv2
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+scene_path = os.path.join(os.path.dirname(os.path.abspath(os.path.dirname(__file__))), 'a')
+
+# realsense D435 depth intrinsics (open3d_pointcloud/clustering.py 와 동일)
+camera_intrinsics = {'fx': 387.5052185058594, 'fy': 387.5052185058594,
+                     'x_offset': 324.73431396484375, 'y_offset': 238.08770751953125,
+                     'img_height': 480, 'img_width': 640}
+
+
+def depth_from_colormap(image, depth_max=3.0, cmap='viridis'):
+    """ Recovers a metric-ish depth image from a depth png written by plt.imsave.
+
+        The recorded scenes in a/ only hold colormapped depth, so the colormap is
+        inverted with a nearest palette lookup and rescaled to [0, depth_max].
+        Pixels mapped to the lowest color are treated as holes (depth 0).
+
+        @param image: a [H x W x 3] or [H x W x 4] RGB(A) numpy array of dtype np.uint8
+        @param depth_max: depth in meters assigned to the highest color
+
+        @return: a [H x W] numpy array of depth values in meters (float32)
+    """
+    cm = plt.get_cmap(cmap)
+    palette = (cm(np.linspace(0, 1, 256))[:, :3] * 255).astype(np.float32)
+    rgb = image[..., :3].reshape(-1, 3).astype(np.int32)
+
+    # 24bit 정수로 묶어서 고유 색상만 팔레트와 비교
+    packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    packed, inverse = np.unique(packed, return_inverse=True)
+    colors = np.stack([packed >> 16, (packed >> 8) & 255, packed & 255], axis=1).astype(np.float32)
+    dist = ((colors[:, None, :] - palette[None, :, :])**2).sum(-1)
+    level = np.argmin(dist, axis=1)[inverse.ravel()]
+
+    return (level.reshape(image.shape[:2]) / 255. * depth_max).astype(np.float32)
+
+
+def load_recorded_scenes(path=scene_path, depth_max=3.0):
+    """ Loads (rgb, depth) pairs of the recorded scenes.
+
+        @return: a list of ([H x W x 3] BGR uint8, [H x W] depth in meters) tuples
+    """
+    scenes = []
+    for depth_file in sorted(glob.glob(os.path.join(path, 'test_depth_*.png'))):
+        color_file = depth_file.replace('test_depth_', 'test_color_')
+        color = cv2.imread(color_file, cv2.IMREAD_COLOR)
+        depth_img = cv2.cvtColor(cv2.imread(depth_file, cv2.IMREAD_UNCHANGED), cv2.COLOR_BGRA2RGBA)
+        scenes.append((color, depth_from_colormap(depth_img, depth_max)))
+    return scenes
@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+import matplotlib.pyplot as plt
+
+from realsense.utilities import back_project
+
+
+INTRINSIC_KEYS = ('fx', 'fy', 'x_offset', 'y_offset', 'img_height', 'img_width')
+
+
+def save_capture(path, depth, color, camera_params, depth_scale):
+    """ Saves one capture as an uncompressed .npz file.
+
+        @param depth: a [H x W] uint16 raw depth image
+        @param color: a [H x W x 3] BGR uint8 image
+        @param camera_params: a dictionary like DepthCamera.get_camera_intrinsics()
+        @param depth_scale: raw depth unit in meters
+    """
+    intrinsics = np.array([camera_params[k] for k in INTRINSIC_KEYS], dtype=np.float64)
+    # 임시 파일에 쓴 뒤 rename: 다른 node가 파일이 보이는 순간 읽어도 항상 완성된 파일
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, depth=depth, color=color, intrinsics=intrinsics,
+                 depth_scale=np.float64(depth_scale))
+    os.replace(tmp_path, path)
+
+
+class Capture:
+    """ A capture loaded from disk. rgb and xyz are only computed when accessed.
+
+        Reads both the .npz format of save_capture and the legacy pickled .npy
+        dictionaries of save_as_npy ({'rgb', 'xyz'}).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.legacy = path.endswith('.npy')
+
+        self._rgb = None
+        self._xyz = None
+        self.depth = None
+        self.color = None
+        self.camera_params = None
+        self.depth_scale = None
+
+        if self.legacy:
+            data = np.load(path, allow_pickle=True, encoding='bytes').item()
+            self._rgb = data['rgb']
+            self._xyz = data['xyz']
+        else:
+            with np.load(path) as data:
+                self.depth = data['depth']
+                self.color = data['color']
+                self.camera_params = dict(zip(INTRINSIC_KEYS, data['intrinsics'].tolist()))
+                self.camera_params['img_height'] = int(self.camera_params['img_height'])
+                self.camera_params['img_width'] = int(self.camera_params['img_width'])
+                self.depth_scale = float(data['depth_scale'])
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.color, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def xyz(self):
+        if self._xyz is None:
+            self._xyz = back_project(self.depth, self.camera_params, self.depth_scale).copy()
+        return self._xyz
+
+    def as_dict(self):
+        """ Same dictionary as save_as_npy."""
+        return {'rgb': self.rgb, 'xyz': self.xyz}
+
+
+def load_capture(path):
+    return Capture(path)
+
+
+class CaptureWriter:
+    """ Writes captures on a background thread so the caller returns immediately."""
+    def __init__(self, maxsize=16):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def save(self, capture_path, depth, color, camera_params, depth_scale, color_path=None, depth_path=None):
+        """ Queues a capture (and optional color/depth preview pngs). The arrays must not be modified afterwards."""
+        self.queue.put((capture_path, depth, color, camera_params, depth_scale, color_path, depth_path))
+
+    def _loop(self):
+        while True:
+            capture_path, depth, color, camera_params, depth_scale, color_path, depth_path = self.queue.get()
+            try:
+                save_capture(capture_path, depth, color, camera_params, depth_scale)
+                if color_path:
+                    cv2.imwrite(color_path, color)
+                if depth_path:
+                    plt.imsave(depth_path, depth)
+            except Exception as e:
+                print(f"Failed to save capture {capture_path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """ Blocks until every queued capture is written."""
+        self.queue.join()
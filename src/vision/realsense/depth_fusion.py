@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class DepthFusion:
+    """ Fuses the last N depth frames into one less noisy depth image.
+
+        Frames are kept in a preallocated [N x H x W] uint16 stack. 0 is an invalid
+        (hole) pixel and is ignored by both methods:
+            'median' : per-pixel median of the valid samples
+            'mean'   : per-pixel mean of the valid samples
+        Pixels without any valid sample stay 0.
+    """
+    def __init__(self, height, width, n=5, method='median'):
+        if method not in ('median', 'mean'):
+            raise Exception(f"Unknown depth fusion method {method}")
+        self.n = n
+        self.method = method
+        self.stack = np.zeros((n, height, width), dtype=np.uint16)
+        self.fused = np.zeros((height, width), dtype=np.uint16)
+        self.count = 0
+        self.index = 0
+
+    def reset(self):
+        self.count = 0
+        self.index = 0
+
+    def add(self, depth):
+        np.copyto(self.stack[self.index], depth)
+        self.index = (self.index + 1) % self.n
+        self.count = min(self.count + 1, self.n)
+
+    def fuse(self):
+        """ @return: a [H x W] uint16 numpy array (reused by the next call)"""
+        if self.count == 0:
+            self.fused[:] = 0
+            return self.fused
+        if self.count == 1:
+            np.copyto(self.fused, self.stack[(self.index - 1) % self.n])
+            return self.fused
+
+        stack = self.stack[:self.count]
+        valid = np.count_nonzero(stack, axis=0)
+
+        if self.method == 'median':
+            # 0(무효)은 정렬하면 앞쪽에 모이므로 유효한 값들의 가운데 index를 바로 계산
+            ordered = np.sort(stack, axis=0)
+            median_index = (self.count - valid) + (valid - 1) // 2
+            median_index = np.maximum(median_index, 0)
+            self.fused[:] = np.take_along_axis(ordered, median_index[None], axis=0)[0]
+        else:
+            total = stack.sum(axis=0, dtype=np.uint32)
+            np.floor_divide(total, np.maximum(valid, 1).astype(np.uint32), out=total)
+            self.fused[:] = total
+
+        self.fused[valid == 0] = 0
+        return self.fused
@@ -1,6 +1,16 @@
 import pyrealsense2 as rs
 import numpy as np
 
+import time
+import threading
+from collections import deque, namedtuple
+
+
+# timestamp: host time (time.time()) when the aligned frame arrived
+# depth_timestamp: device timestamp of the depth frame [ms] (depth runs slower than color, so it repeats)
+Frame = namedtuple('Frame', ['timestamp', 'depth', 'color', 'depth_timestamp'])
+
+
 class DepthCamera:
     def __init__(self, resolution_width, resolution_height):
         # Configure depth and color streams
@@ -31,9 +41,75 @@ class DepthCamera:
         self.depth_intrinsics = depth_profile.get_intrinsics()
         # print(self.get_camera_intrinsics)
         # print(self.depth_intrinsics)
+
+        self.frames = None
+        self.frame_cond = threading.Condition()
+        self.capture_thread = None
+        self.capturing = False
+
+    def start_capture(self, buffer_size=4):
+        """
+        Starts a thread that owns the pipeline and keeps the last buffer_size aligned frames.
+        After this, read frames with latest() / wait_newer_than() instead of get_frame().
+        """
+        if self.capture_thread is not None:
+            return
+        self.frames = deque(maxlen=buffer_size)
+        self.capturing = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+
+    def _capture_loop(self):
+        while self.capturing:
+            try:
+                frames = self.pipeline.wait_for_frames()
+            except RuntimeError:
+                continue
+            timestamp = time.time()
+            aligned_frames = self.align.process(frames)
+            depth_frame = aligned_frames.get_depth_frame()
+            color_frame = aligned_frames.get_color_frame()
+            if not depth_frame or not color_frame:
+                continue
+
+            # realsense frame pool을 바로 돌려주기 위해 복사해서 보관
+            frame = Frame(timestamp,
+                          np.asanyarray(depth_frame.get_data()).copy(),
+                          np.asanyarray(color_frame.get_data()).copy(),
+                          depth_frame.get_timestamp())
+            with self.frame_cond:
+                self.frames.append(frame)
+                self.frame_cond.notify_all()
+
+    def latest(self):
+        """Returns the newest Frame without blocking, or None if nothing was captured yet."""
+        with self.frame_cond:
+            if not self.frames:
+                return None
+            return self.frames[-1]
+
+    def wait_newer_than(self, timestamp, timeout=None):
+        """Returns the first buffered Frame captured after timestamp, waiting for it if needed (None on timeout)."""
+        def newer():
+            for frame in self.frames:
+                if frame.timestamp > timestamp:
+                    return frame
+            return None
+
+        with self.frame_cond:
+            frame = newer()
+            if frame is None:
+                self.frame_cond.wait_for(lambda: newer() is not None, timeout)
+                frame = newer()
+        return frame
        
     def get_frame(self):
-    
+        if self.capture_thread is not None:
+            frame = self.latest()
+            if frame is None:
+                return False, None, None
+            return True, frame.depth, frame.color
+
         # Align the depth frame to color frame
         
         frames = self.pipeline.wait_for_frames()
@@ -48,6 +124,7 @@ class DepthCamera:
         return True, depth_image, color_image
 
     def get_raw_frame(self):
+        # start_capture() 이후에는 사용하지 말 것 (파이프라인은 capture thread 소유)
         frames = self.pipeline.wait_for_frames()
         aligned_frames = self.align.process(frames)
         depth_frame = aligned_frames.get_depth_frame()
@@ -78,4 +155,8 @@ class DepthCamera:
         return camera_params
 
     def release(self):
+        if self.capture_thread is not None:
+            self.capturing = False
+            self.capture_thread.join(timeout=1.0)
+            self.capture_thread = None
         self.pipeline.stop()
\ No newline at end of file
@@ -1,4 +1,8 @@
+import threading
+import functools
+
 import numpy as np
+from scipy import ndimage
 import matplotlib.pyplot as plt
 import cv2
 # import torch
@@ -23,6 +27,31 @@ class AverageMeter(object):
         self.avg = self.sum / self.count
 
 
+@functools.lru_cache(maxsize=32)
+def get_palette(num_colors, w_ratio=0.0):
+    """ uint8 [num_colors x 3] lookup table of the gist_rainbow colors used by get_color_mask
+        (w_ratio > 0: colors blended toward white like visualize_segmentation). Index 0 is black.
+    """
+    colors = plt.get_cmap('gist_rainbow')(np.arange(num_colors) / num_colors)[:, :3]
+    if w_ratio > 0:
+        palette = (colors * (1 - w_ratio) + w_ratio) * 255
+        palette = palette.round()
+    else:
+        palette = colors * 255
+    palette = palette.astype(np.uint8)
+    palette[0] = 0
+    palette.flags.writeable = False
+    return palette
+
+
+def palette_index(mask):
+    # palette[mask] 용 index (uint8 등 unsigned mask는 복사 없이, 음수 label은 0으로)
+    mask = np.asarray(mask)
+    if mask.dtype.kind == 'u':
+        return mask
+    return np.maximum(mask.astype(int), 0)
+
+
 def get_color_mask(object_index, nc=None):
     """ Colors each index differently. Useful for visualizing semantic masks
 
@@ -31,23 +60,15 @@ def get_color_mask(object_index, nc=None):
 
         @return: a [H x W x 3] numpy array of dtype np.uint8
     """
-    object_index = object_index.astype(int)
+    object_index = palette_index(object_index)
 
     if nc is None:
-        NUM_COLORS = object_index.max() + 1
+        NUM_COLORS = int(object_index.max()) + 1
     else:
         NUM_COLORS = nc
 
-    cm = plt.get_cmap('gist_rainbow')
-    colors = [cm(1. * i/NUM_COLORS) for i in range(NUM_COLORS)]
-
-    color_mask = np.zeros(object_index.shape + (3,)).astype(np.uint8)
-    for i in np.unique(object_index):
-        if i == 0 or i == -1:
-            continue
-        color_mask[object_index == i, :] = np.array(colors[i][:3]) * 255
-        
-    return color_mask
+    # -1도 배경(0)으로
+    return get_palette(max(int(NUM_COLORS), 1))[object_index]
 
 
 def build_matrix_of_indices(height, width):
@@ -88,63 +109,32 @@ def visualize_segmentation(im, masks, nc=None):
 
         @return: a [H x W x 3] numpy array of dtype np.uint8
     """ 
-    from matplotlib.patches import Polygon
-
-    masks = masks.astype(int)
-    im = im.copy()
+    masks = palette_index(masks)
 
     # Generate color mask
     if nc is None:
-        NUM_COLORS = masks.max() + 1
+        NUM_COLORS = int(masks.max()) + 1
     else:
         NUM_COLORS = nc
 
-    cm = plt.get_cmap('gist_rainbow')
-    colors = [cm(1. * i/NUM_COLORS) for i in range(NUM_COLORS)]
-
-    # Mask
-    imgMask = np.zeros(im.shape)
-
-
-    # Draw color masks
-    for i in np.unique(masks):
-        if i == 0: # background
-            continue
-
-        # Get the color mask
-        color_mask = np.array(colors[i][:3])
-        w_ratio = .4
-        for c in range(3):
-            color_mask[c] = color_mask[c] * (1 - w_ratio) + w_ratio
-        e = (masks == i)
-
-        # Add to the mask
-        imgMask[e] = color_mask
-
-    # Add the mask to the image
-    imgMask = (imgMask * 255).round().astype(np.uint8)
+    # Add the mask to the image (label -> color lookup 한번)
+    imgMask = get_palette(max(int(NUM_COLORS), 1), w_ratio=.4)[masks]
     im = cv2.addWeighted(im, 0.5, imgMask, 0.5, 0.0)
 
-
-    # Draw mask contours
-    for i in np.unique(masks):
-        if i == 0: # background
+    # Draw mask contours: 한번의 label pass로 구한 bounding box 안에서만 contour 추출, 한번에 그림
+    height, width = masks.shape
+    contours = []
+    for i, box in enumerate(ndimage.find_objects(masks)):
+        if box is None:
             continue
+        y0, y1 = max(box[0].start - 1, 0), min(box[0].stop + 1, height)
+        x0, x1 = max(box[1].start - 1, 0), min(box[1].stop + 1, width)
+        e = (masks[y0:y1, x0:x1] == i + 1).astype(np.uint8)
+        contour, hier = cv2.findContours(e, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE, offset=(x0, y0))
+        contours.extend(contour)
 
-        # Get the color mask
-        color_mask = np.array(colors[i][:3])
-        w_ratio = .4
-        for c in range(3):
-            color_mask[c] = color_mask[c] * (1 - w_ratio) + w_ratio
-        e = (masks == i)
-
-        # Find contours
-        contour, hier = cv2.findContours(
-            e.astype(np.uint8).copy(), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
-
-        # Plot the nice outline
-        for c in contour:
-            cv2.drawContours(im, contour, -1, (255,255,255), 2)
+    if len(contours) > 0:
+        cv2.drawContours(im, contours, -1, (255,255,255), 2)
 
     return im
     
@@ -201,17 +191,9 @@ def mask_to_tight_box(mask):
         raise Exception(f"Data type {type(mask)} not understood for mask_to_tight_box...")
 
 
-def compute_xyz(depth_img, camera_params):
-    """ Compute ordered point cloud from depth image and camera parameters.
-        Assumes camera uses left-handed coordinate system, with 
-            x-axis pointing right
-            y-axis pointing up
-            z-axis pointing "forward"
-
-        @param depth_img: a [H x W] numpy array of depth values in meters
-        @param camera_params: a dictionary with parameters of the camera used 
-
-        @return: a [H x W x 3] numpy array
+def get_focal_and_offset(camera_params):
+    """ Returns (fx, fy, x_offset, y_offset) from camera parameters.
+        Simulated cameras only give fov/near, real ones give fx/fy/x_offset/y_offset.
     """
 
     # Compute focal length from camera parameters
@@ -234,6 +216,24 @@ def compute_xyz(depth_img, camera_params):
         x_offset = camera_params['img_width']/2
         y_offset = camera_params['img_height']/2
 
+    return fx, fy, x_offset, y_offset
+
+
+def compute_xyz(depth_img, camera_params):
+    """ Compute ordered point cloud from depth image and camera parameters.
+        Assumes camera uses left-handed coordinate system, with 
+            x-axis pointing right
+            y-axis pointing up
+            z-axis pointing "forward"
+
+        @param depth_img: a [H x W] numpy array of depth values in meters
+        @param camera_params: a dictionary with parameters of the camera used 
+
+        @return: a [H x W x 3] numpy array
+    """
+
+    fx, fy, x_offset, y_offset = get_focal_and_offset(camera_params)
+
     indices = build_matrix_of_indices(camera_params['img_height'], camera_params['img_width'])
     indices[..., 0] = np.flipud(indices[..., 0]) # pixel indices start at top-left corner. for these equations, it starts at bottom-left
     z_e = depth_img
@@ -244,6 +244,84 @@ def compute_xyz(depth_img, camera_params):
     return xyz_img
 
 
+class BackProjector(object):
+    """ compute_xyz with precomputed ray tables and a reusable float32 output buffer.
+
+        (u - x_offset) / fx only depends on the column and (v - y_offset) / fy only
+        on the (flipped) row, so the per-pixel ray table is kept as a [W] and a [H x 1]
+        array and broadcast against the depth image. With step > 1 the depth image is
+        decimated with a strided view before back-projection.
+
+        The output buffer is reused between calls (one per thread), copy it if it has
+        to outlive the next call.
+    """
+    def __init__(self, camera_params, step=1):
+        fx, fy, x_offset, y_offset = get_focal_and_offset(camera_params)
+        height = camera_params['img_height']
+        width = camera_params['img_width']
+
+        self.step = step
+        self.shape = (len(range(0, height, step)), len(range(0, width, step)))
+
+        u = np.arange(0, width, step, dtype=np.float64)
+        v = np.arange(0, height, step, dtype=np.float64)
+        # pixel indices start at top-left corner. for these equations, it starts at bottom-left
+        self.ray_x = ((u - x_offset) / fx).astype(np.float32)
+        self.ray_y = (((height - 1 - v) - y_offset) / fy).astype(np.float32)[:, None]
+
+        self._local = threading.local()
+
+    def buffer(self):
+        xyz = getattr(self._local, 'xyz', None)
+        if xyz is None:
+            xyz = np.empty(self.shape + (3,), dtype=np.float32)
+            self._local.xyz = xyz
+        return xyz
+
+    def __call__(self, depth_img, depth_scale=1.0, out=None):
+        """ @param depth_img: a [H x W] numpy array of raw depth values (e.g. uint16)
+            @param depth_scale: multiplied to depth_img to get meters
+            @param out: optional [H' x W' x 3] float32 array to write into
+
+            @return: a [H' x W' x 3] float32 numpy array (H' = ceil(H / step))
+        """
+        if self.step > 1:
+            depth_img = depth_img[::self.step, ::self.step]
+        xyz = self.buffer() if out is None else out
+
+        z_e = xyz[..., 2]
+        np.multiply(depth_img, np.float32(depth_scale), out=z_e, casting='unsafe')
+        np.multiply(z_e, self.ray_x, out=xyz[..., 0])
+        np.multiply(z_e, self.ray_y, out=xyz[..., 1])
+
+        return xyz
+
+
+_back_projectors = {}
+_back_projectors_lock = threading.Lock()
+
+def get_back_projector(camera_params, step=1):
+    """ Returns the BackProjector of the given intrinsics, building it on first use.
+
+        @param camera_params: a dictionary like DepthCamera.get_camera_intrinsics()
+    """
+    key = (tuple(sorted(camera_params.items())), step)
+    with _back_projectors_lock:
+        projector = _back_projectors.get(key)
+        if projector is None:
+            projector = BackProjector(camera_params, step)
+            _back_projectors[key] = projector
+    return projector
+
+
+def back_project(depth_img, camera_params, depth_scale=1.0, step=1, out=None):
+    """ Cached equivalent of compute_xyz(depth_img * depth_scale, camera_params) in float32.
+
+        @return: a [H' x W' x 3] float32 numpy array, reused by the next call of the same thread
+    """
+    return get_back_projector(camera_params, step)(depth_img, depth_scale, out)
+
+
 def seg2bmap(seg, return_contour=False):
     """ From a segmentation, compute a binary boundary map with 1 pixel wide
         boundaries. This boundary lives on the mask, i.e. it's a subset of the mask.
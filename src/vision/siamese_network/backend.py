@@ -0,0 +1,271 @@
+import os
+import sys
+import hashlib
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+
+import torch
+import torch.nn as nn
+
+from model import SiameseNetwork
+
+
+# export 결과물 파일 이름 (checkpoint와 같은 폴더에 <checkpoint 이름>_embed.pt 등으로 저장)
+artifact_names = {
+    ('torchscript', False): ('_embed.pt', '_head.pt'),
+    ('torchscript', True): ('_embed_int8.pt', '_head.pt'),
+    ('onnx', False): ('_embed.onnx', '_head.onnx'),
+    ('onnx', True): ('_embed_int8.onnx', '_head.onnx'),
+}
+
+feed_shape = (3, 100, 100)
+
+
+def onnxruntime_available():
+    try:
+        import onnxruntime
+        return True
+    except ImportError:
+        return False
+
+
+def artifact_paths(checkpoint, backend, quantized=False):
+    root = os.path.splitext(checkpoint)[0]
+    embed_name, head_name = artifact_names[(backend, quantized)]
+    return root + embed_name, root + head_name
+
+
+def is_stale(path, checkpoint):
+    # 파일이 없거나 checkpoint보다 먼저 만들어졌으면 (재학습, best.pth 교체) 다시 만들어야 함
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(checkpoint)
+
+
+def file_hash(path, length=12):
+    # 파일 내용 sha1 앞부분 (embedding을 계산한 weight 구분용)
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:length]
+
+
+def weights_path(checkpoint):
+    # best.pth -> best_weights.pth
+    root, ext = os.path.splitext(checkpoint)
+    return root + '_weights' + ext
+
+
+def save_weights(model, backbone, path):
+    """ 추론용 가벼운 파일: backbone 이름과 model weight만 저장 (optimizer state 제외)"""
+    torch.save({"backbone": backbone, "model_state_dict": model.state_dict()}, path)
+
+
+def load_model(checkpoint, device='cpu'):
+    """ ImageNet weight를 받지 않고 checkpoint weight로만 모델 생성.
+        checkpoint 옆에 *_weights.pth가 있으면 그 파일을 읽음 (없거나 checkpoint보다 오래됐으면 만들어 둠).
+    """
+    slim_path = weights_path(checkpoint)
+    if not is_stale(slim_path, checkpoint):
+        state = torch.load(slim_path, map_location=device, weights_only=True)
+    else:
+        state = torch.load(checkpoint, map_location=device)
+        try:
+            torch.save({"backbone": state['backbone'], "model_state_dict": state['model_state_dict']}, slim_path)
+        except OSError:
+            pass
+
+    model = SiameseNetwork(backbone=state['backbone'], pretrained=False)
+    model.load_state_dict(state['model_state_dict'])
+    model.to(device)
+    model.eval()
+    return model, state['backbone']
+
+
+class Head(nn.Module):
+    """ cls_head를 (feat1, feat2) 입력으로 감싼 모듈 (export용)"""
+    def __init__(self, model):
+        super().__init__()
+        self.cls_head = model.cls_head
+
+    def forward(self, feat1, feat2):
+        return self.cls_head(feat1 * feat2)
+
+
+def quantize_backbone(model, backbone, calibration_batches=None):
+    """ int8 backbone.
+
+        resnet 계열은 torchvision quantizable resnet으로 conv까지 static 양자화
+        (calibration_batches로 activation 범위 측정), 그 외 backbone은 Linear만 dynamic 양자화.
+    """
+    from torch.ao import quantization
+    from torchvision.models import quantization as qmodels
+
+    if backbone in qmodels.__dict__ and backbone.startswith('resnet') and calibration_batches:
+        torch.backends.quantized.engine = 'fbgemm' if 'fbgemm' in torch.backends.quantized.supported_engines else 'qnnpack'
+        qmodel = qmodels.__dict__[backbone](weights=None, quantize=False)
+        qmodel.load_state_dict(model.backbone.state_dict())
+        qmodel.eval()
+        qmodel.fuse_model()
+        qmodel.qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+        quantization.prepare(qmodel, inplace=True)
+        with torch.inference_mode():
+            for batch in calibration_batches:
+                qmodel(batch)
+        quantization.convert(qmodel, inplace=True)
+        return qmodel
+
+    return quantization.quantize_dynamic(model.backbone, {nn.Linear}, dtype=torch.qint8)
+
+
+def export_torchscript(model, checkpoint, backbone=None, quantized=False, calibration_batches=None):
+    embed_path, head_path = artifact_paths(checkpoint, 'torchscript', quantized)
+    example = torch.zeros((2,) + feed_shape)
+
+    net = quantize_backbone(model, backbone, calibration_batches) if quantized else model.backbone
+    with torch.inference_mode():
+        embed = torch.jit.freeze(torch.jit.trace(net, example))
+        torch.jit.save(embed, embed_path)
+
+        feat = model.backbone(example)
+        head = torch.jit.freeze(torch.jit.trace(Head(model).eval(), (feat, feat)))
+        torch.jit.save(head, head_path)
+    return embed_path, head_path
+
+
+def export_onnx(model, checkpoint, quantized=False, calibration_batches=None):
+    """ backbone, head를 각각 batch 크기가 가변인 onnx로 저장.
+        quantized면 onnxruntime int8 양자화: calibration_batches가 있으면 static (QDQ),
+        없으면 dynamic (ConvInteger는 CPU에서 느리므로 static 권장)
+    """
+    embed_path, head_path = artifact_paths(checkpoint, 'onnx', False)
+    example = torch.zeros((2,) + feed_shape)
+
+    with torch.inference_mode():
+        feat = model.backbone(example)
+
+    torch.onnx.export(model.backbone, (example,), embed_path,
+                      input_names=['image'], output_names=['feat'],
+                      dynamic_axes={'image': {0: 'batch'}, 'feat': {0: 'batch'}},
+                      dynamo=False)
+    torch.onnx.export(Head(model).eval(), (feat, feat), head_path,
+                      input_names=['feat1', 'feat2'], output_names=['prob'],
+                      dynamic_axes={'feat1': {0: 'batch'}, 'feat2': {0: 'batch'}, 'prob': {0: 'batch'}},
+                      dynamo=False)
+
+    if quantized:
+        from onnxruntime import quantization
+        int8_path, _ = artifact_paths(checkpoint, 'onnx', True)
+
+        if calibration_batches:
+            class Reader(quantization.CalibrationDataReader):
+                def __init__(self):
+                    self.batches = iter(calibration_batches)
+
+                def get_next(self):
+                    batch = next(self.batches, None)
+                    return None if batch is None else {'image': batch.numpy().astype(np.float32)}
+
+            quantization.quantize_static(embed_path, int8_path, Reader(),
+                                         quant_format=quantization.QuantFormat.QDQ,
+                                         per_channel=True,
+                                         activation_type=quantization.QuantType.QUInt8,
+                                         weight_type=quantization.QuantType.QInt8)
+        else:
+            quantization.quantize_dynamic(embed_path, int8_path, weight_type=quantization.QuantType.QInt8)
+        embed_path = int8_path
+
+    return embed_path, head_path
+
+
+class TorchBackend:
+    """ eager SiameseNetwork (GPU 사용 가능)"""
+    name = 'torch'
+
+    def __init__(self, model, device, channels_last=False):
+        self.model = model
+        self.device = device
+        self.channels_last = channels_last
+        if channels_last:
+            self.model.to(memory_format=torch.channels_last)
+
+    def embed(self, batch):
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            return self.model.embed(batch)
+
+    def head(self, feat1, feat2):
+        with torch.inference_mode():
+            return self.model.head(feat1, feat2)
+
+
+class TorchScriptBackend:
+    name = 'torchscript'
+
+    def __init__(self, embed_path, head_path, channels_last=True):
+        self.embed_model = torch.jit.load(embed_path, map_location='cpu')
+        self.head_model = torch.jit.load(head_path, map_location='cpu')
+        self.channels_last = channels_last
+
+    def embed(self, batch):
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            return self.embed_model(batch)
+
+    def head(self, feat1, feat2):
+        with torch.inference_mode():
+            return self.head_model(feat1, feat2)
+
+
+class OnnxBackend:
+    """ onnxruntime CPU 실행. 입출력은 다른 backend와 같이 torch tensor"""
+    name = 'onnx'
+
+    def __init__(self, embed_path, head_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        providers = ['CPUExecutionProvider']
+        self.embed_session = ort.InferenceSession(embed_path, options, providers=providers)
+        self.head_session = ort.InferenceSession(head_path, options, providers=providers)
+
+    def embed(self, batch):
+        image = np.ascontiguousarray(batch.cpu().numpy(), dtype=np.float32)
+        return torch.from_numpy(self.embed_session.run(None, {'image': image})[0])
+
+    def head(self, feat1, feat2):
+        feed = {'feat1': np.ascontiguousarray(feat1.cpu().numpy(), dtype=np.float32),
+                'feat2': np.ascontiguousarray(feat2.cpu().numpy(), dtype=np.float32)}
+        return torch.from_numpy(self.head_session.run(None, feed)[0])
+
+
+if __name__ == "__main__":
+    from torch.utils.data import DataLoader
+    from dataset import Dataset
+
+    val_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/val"
+    checkpoint = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/best.pth"
+    if len(sys.argv) > 1:
+        checkpoint = sys.argv[1]
+    calibration_pairs = 64
+
+    model, backbone = load_model(checkpoint)
+
+    # static 양자화 calibration: val 이미지 일부
+    calibration_batches = []
+    if os.path.exists(val_path):
+        for i, ((img1, img2), y, _) in enumerate(DataLoader(Dataset(val_path, shuffle_pairs=False, augment=False), batch_size=8)):
+            calibration_batches += [img1, img2]
+            if (i + 1) * 8 >= calibration_pairs:
+                break
+
+    print(export_torchscript(model, checkpoint))
+    print(export_torchscript(model, checkpoint, backbone, quantized=True, calibration_batches=calibration_batches))
+    print(export_onnx(model, checkpoint, quantized=True, calibration_batches=calibration_batches))
@@ -0,0 +1,148 @@
+import os
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from torch.utils.tensorboard import SummaryWriter
+
+from model import SiameseNetwork
+from dataset import Dataset
+from backend import load_model, save_weights
+
+if __name__ == "__main__":
+    train_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/train"
+    val_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/val"
+    out_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network"
+    teacher_checkpoint = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/best.pth"
+    backbone = "mobilenet_v3_small"  # or "tiny_cnn"
+    learning_rate = 1e-4
+    epochs = 300
+    save_after = int(epochs/10)
+
+    # loss = label_weight * BCE(label) + soft_weight * BCE(teacher 유사도) + embed_weight * MSE(teacher embedding)
+    label_weight = 1.0
+    soft_weight = 1.0
+    embed_weight = 0.1
+
+    os.makedirs(out_path, exist_ok=True)
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    train_dataset   = Dataset(train_path, shuffle_pairs=True, augment=True)
+    val_dataset     = Dataset(val_path, shuffle_pairs=False, augment=False)
+
+    train_dataloader = DataLoader(train_dataset, batch_size=8, drop_last=True)
+    val_dataloader   = DataLoader(val_dataset, batch_size=8)
+
+    teacher, teacher_backbone = load_model(teacher_checkpoint, device)
+    for param in teacher.parameters():
+        param.requires_grad = False
+
+    model = SiameseNetwork(backbone=backbone)
+
+    # embedding 크기가 같으면 teacher의 head로 시작 (student는 teacher의 feature 공간을 따라가도록)
+    out_features = list(model.backbone.modules())[-1].out_features
+    teacher_features = list(teacher.backbone.modules())[-1].out_features
+    if out_features == teacher_features:
+        model.cls_head.load_state_dict(teacher.cls_head.state_dict())
+    else:
+        embed_weight = 0.0
+    model.to(device)
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    criterion = torch.nn.BCELoss()
+
+    name = "student_" + backbone
+    writer = SummaryWriter(os.path.join(out_path, "summary", name))
+
+    best_val = 10000000000
+
+    for epoch in range(epochs):
+        print("[{} / {}]".format(epoch, epochs))
+        model.train()
+
+        losses = []
+        correct = 0
+        total = 0
+
+        for (img1, img2), y, (class1, class2) in train_dataloader:
+            img1, img2, y = map(lambda x: x.to(device), [img1, img2, y])
+
+            with torch.no_grad():
+                teacher_feat1 = teacher.embed(img1)
+                teacher_feat2 = teacher.embed(img2)
+                teacher_prob = teacher.head(teacher_feat1, teacher_feat2)
+
+            feat1 = model.embed(img1)
+            feat2 = model.embed(img2)
+            prob = model.head(feat1, feat2)
+
+            loss = label_weight * criterion(prob, y) + soft_weight * criterion(prob, teacher_prob)
+            if embed_weight > 0:
+                loss = loss + embed_weight * (F.mse_loss(feat1, teacher_feat1) + F.mse_loss(feat2, teacher_feat2))
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            losses.append(loss.item())
+            correct += torch.count_nonzero(y == (prob > 0.5)).item()
+            total += len(y)
+
+        writer.add_scalar('train_loss', sum(losses)/len(losses), epoch)
+        writer.add_scalar('train_acc', correct / total, epoch)
+
+        print("\tTraining: Loss={:.2f}\t Accuracy={:.2f}\t".format(sum(losses)/len(losses), correct / total))
+
+        model.eval()
+
+        losses = []
+        correct = 0
+        agree = 0
+        total = 0
+
+        with torch.no_grad():
+            for (img1, img2), y, (class1, class2) in val_dataloader:
+                img1, img2, y = map(lambda x: x.to(device), [img1, img2, y])
+
+                prob = model(img1, img2)
+                teacher_prob = teacher(img1, img2)
+                loss = criterion(prob, y)
+
+                losses.append(loss.item())
+                correct += torch.count_nonzero(y == (prob > 0.5)).item()
+                agree += torch.count_nonzero((teacher_prob > 0.5) == (prob > 0.5)).item()
+                total += len(y)
+
+        val_loss = sum(losses)/max(1, len(losses))
+        writer.add_scalar('val_loss', val_loss, epoch)
+        writer.add_scalar('val_acc', correct / total, epoch)
+        writer.add_scalar('val_teacher_agreement', agree / total, epoch)
+
+        print("\tValidation: Loss={:.2f}\t Accuracy={:.2f}\t Teacher agreement={:.2f}\t".format(val_loss, correct / total, agree / total))
+
+        if val_loss < best_val:
+            best_val = val_loss
+            torch.save(
+                {
+                    "epoch": epoch + 1,
+                    "model_state_dict": model.state_dict(),
+                    "backbone": backbone,
+                    "teacher": teacher_checkpoint,
+                    "optimizer_state_dict": optimizer.state_dict()
+                },
+                os.path.join(out_path, name + "_best.pth")
+            )
+            save_weights(model, backbone, os.path.join(out_path, name + "_best_weights.pth"))
+
+        if (epoch + 1) % save_after == 0:
+            torch.save(
+                {
+                    "epoch": epoch + 1,
+                    "model_state_dict": model.state_dict(),
+                    "backbone": backbone,
+                    "teacher": teacher_checkpoint,
+                    "optimizer_state_dict": optimizer.state_dict()
+                },
+                os.path.join(out_path, name + "_epoch_{}.pth".format(epoch + 1))
+            )
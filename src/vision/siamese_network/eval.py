@@ -15,17 +15,68 @@ from torchvision import transforms
 
 from model import SiameseNetwork
 from dataset import Dataset
+from backend import TorchBackend, TorchScriptBackend, OnnxBackend, load_model, artifact_paths, \
+    export_torchscript, export_onnx, onnxruntime_available, is_stale, file_hash, weights_path
 
 class Siamese:
-    def __init__(self) -> None:
-        checkpoint = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/best.pth"
+    def __init__(self, backend='auto', quantized=False, num_threads=None, channels_last=True, checkpoint=None) -> None:
+        """ @param backend: 'torch' (eager), 'torchscript', 'onnx', 'auto'
+                            auto: GPU가 있으면 torch, 없으면 onnxruntime 설치 시 onnx, 아니면 torchscript
+            @param quantized: int8 backbone 사용 (torchscript/onnx, backend.py로 미리 export)
+                              fp32 export 결과물은 checkpoint보다 오래됐으면 다시 export
+            @param num_threads: CPU intra-op thread 수 (None이면 기본값)
+            @param channels_last: torch/torchscript backend 입력을 NHWC 메모리 배치로
+            @param checkpoint: 사용할 모델 (None이면 best.pth, distill.py의 student도 가능)
+        """
+        if checkpoint is None:
+            checkpoint = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/best.pth"
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-        checkpoint = torch.load(checkpoint)
-        self.model = SiameseNetwork(backbone=checkpoint['backbone'])
-        self.model.to(device)
-        self.model.load_state_dict(checkpoint['model_state_dict'])
-        self.model.eval()
+        if backend == 'auto':
+            if device.type == 'cuda':
+                backend = 'torch'
+            else:
+                backend = 'onnx' if onnxruntime_available() else 'torchscript'
+        if backend != 'torch':
+            device = torch.device('cpu')
+        self.device = device
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        if backend == 'torch':
+            model, _ = load_model(checkpoint, device)
+            self.model = model
+            self.backend = TorchBackend(model, device, channels_last and device.type == 'cpu')
+        elif backend in ('torchscript', 'onnx'):
+            embed_path, head_path = artifact_paths(checkpoint, backend, quantized)
+            if is_stale(embed_path, checkpoint) or is_stale(head_path, checkpoint):
+                if quantized:
+                    raise Exception(f"{embed_path} not found or older than {checkpoint}, "
+                                    "run siamese_network/backend.py first")
+                model, _ = load_model(checkpoint)
+                if backend == 'onnx':
+                    export_onnx(model, checkpoint)
+                else:
+                    export_torchscript(model, checkpoint)
+
+            if backend == 'onnx':
+                self.backend = OnnxBackend(embed_path, head_path, num_threads)
+            else:
+                self.backend = TorchScriptBackend(embed_path, head_path, channels_last)
+        else:
+            raise Exception(f"Unknown Siamese backend {backend}")
+
+        # 저장된 embedding이 같은 모델로 계산된 것인지 확인용 (재학습하면 weight hash가 바뀜)
+        # torch는 load_model이 읽은 가벼운 *_weights.pth (optimizer state가 있는 checkpoint 전체는 읽지 않음)
+        if backend == 'torch':
+            weights_file = weights_path(checkpoint)
+            if is_stale(weights_file, checkpoint):   # *_weights.pth 저장 실패 시
+                weights_file = checkpoint
+        else:
+            weights_file = embed_path
+        self.model_key = "{}:{}:{}:{}".format(os.path.basename(checkpoint), file_hash(weights_file),
+                                              backend, 'int8' if quantized else 'fp32')
 
         self.transform = transforms.Compose([
                                                 transforms.ToTensor(),
@@ -33,17 +84,52 @@ class Siamese:
                                             ])
         
     def eval(self, img1, img2):
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         img1 = Image.fromarray(img1)
         img2 = Image.fromarray(img2)
 
-        img1 = self.transform(img1).float().unsqueeze(0)
-        img2 = self.transform(img2).float().unsqueeze(0)
+        img1 = self.transform(img1).float().unsqueeze(0).to(self.device)
+        img2 = self.transform(img2).float().unsqueeze(0).to(self.device)
 
-        prob = self.model(img1.to(device), img2.to(device))
+        prob = self.backend.head(self.backend.embed(img1), self.backend.embed(img2))
 
         return prob[0][0].item()
 
+    def to_batch(self, images):
+        """ [H x W x 3] RGB uint8 images (same size, or one [B x H x W x 3] array) -> normalized [B x 3 x H x W] tensor. Same as self.transform."""
+        if not isinstance(images, np.ndarray):
+            images = np.stack(images)
+        batch = torch.from_numpy(np.ascontiguousarray(images)).to(self.device)
+        batch = batch.permute(0, 3, 1, 2).float().div_(255)
+        mean = torch.tensor([0.485, 0.456, 0.406], device=self.device).view(1, 3, 1, 1)
+        std = torch.tensor([0.229, 0.224, 0.225], device=self.device).view(1, 3, 1, 1)
+        return batch.sub_(mean).div_(std)
+
+    def embed(self, images):
+        """ One backbone pass over all images. @return: [B x D] tensor"""
+        with torch.inference_mode():
+            return self.backend.embed(self.to_batch(images))
+
+    def similarity_matrix(self, feat1, feat2):
+        """ Head evaluation of every (feat1[i], feat2[j]) pair in one batch. @return: [N x K] numpy array"""
+        n, k = feat1.shape[0], feat2.shape[0]
+        with torch.inference_mode():
+            combined1 = feat1[:, None, :].expand(n, k, -1).reshape(n * k, -1)
+            combined2 = feat2[None, :, :].expand(n, k, -1).reshape(n * k, -1)
+            prob = self.backend.head(combined1, combined2)
+        return prob.reshape(n, k).cpu().numpy()
+
+    def warmup(self, batch_size=8):
+        """ 첫 요청이 lazy 초기화(메모리 할당, kernel 선택, graph 최적화) 비용을 내지 않도록 dummy 입력으로 한번 실행"""
+        images = [np.zeros((100, 100, 3), dtype=np.uint8)] * batch_size
+        feat = self.embed(images)
+        self.similarity_matrix(feat[:2], feat)
+
+    def match(self, images1, images2):
+        """ [N x K] similarity of every image pair with one backbone pass per image."""
+        if len(images1) == 0 or len(images2) == 0:
+            return np.zeros((len(images1), len(images2)), dtype=np.float32)
+        return self.similarity_matrix(self.embed(images1), self.embed(images2))
+
 
 if __name__ == "__main__":
     val_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/val"
@@ -4,11 +4,44 @@ import torch.nn.functional as F
 
 from torchvision import models
 
+class TinyCNN(nn.Module):
+    """ Small backbone for the 100x100 crops (distillation student).
+        The last layer is a Linear so SiameseNetwork can read out_features like torchvision models."""
+    def __init__(self, out_features=1000, width=32):
+        super().__init__()
+        layers = []
+        in_channels = 3
+        for channels in (width, width*2, width*4, width*8):
+            layers += [
+                nn.Conv2d(in_channels, channels, 3, stride=2, padding=1, bias=False),
+                nn.BatchNorm2d(channels),
+                nn.ReLU(inplace=True),
+            ]
+            in_channels = channels
+        self.features = nn.Sequential(*layers)
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.fc = nn.Linear(in_channels, out_features)
+
+    def forward(self, x):
+        return self.fc(torch.flatten(self.pool(self.features(x)), 1))
+
+
+# backbones that are not in torchvision.models
+custom_backbones = {
+    "tiny_cnn": TinyCNN,
+}
+
 class SiameseNetwork(nn.Module):
-    def __init__(self, backbone="resnet18"):
+    def __init__(self, backbone="resnet18", pretrained=True):
         super().__init__()
         # Create a backbone network.
-        self.backbone = models.__dict__[backbone](pretrained=True, progress=True)
+        # pretrained=False never downloads ImageNet weights (inference, weights come from a checkpoint).
+        if backbone in custom_backbones:
+            self.backbone = custom_backbones[backbone]()
+        elif pretrained:
+            self.backbone = models.__dict__[backbone](pretrained=True, progress=True)
+        else:
+            self.backbone = models.__dict__[backbone](weights=None)
 
         # Get the number of features that are outputted by the last layer of backbone network.
         out_features = list(self.backbone.modules())[-1].out_features
@@ -31,11 +64,18 @@ class SiameseNetwork(nn.Module):
             nn.Sigmoid(),
         )
 
-    def forward(self, img1, img2):
-        feat1 = self.backbone(img1)
-        feat2 = self.backbone(img2)
-        
+    def embed(self, img):
+        # backbone feature of a batch of images
+        return self.backbone(img)
+
+    def head(self, feat1, feat2):
+        # similarity of feature pairs (same batch size, or broadcastable)
         combined_features = feat1 * feat2
+        return self.cls_head(combined_features)
+
+    def forward(self, img1, img2):
+        feat1 = self.embed(img1)
+        feat2 = self.embed(img2)
 
-        output = self.cls_head(combined_features)
+        output = self.head(feat1, feat2)
         return output
\ No newline at end of file
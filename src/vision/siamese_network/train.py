@@ -11,6 +11,7 @@ from torch.utils.tensorboard import SummaryWriter
 
 from model import SiameseNetwork
 from dataset import Dataset
+from backend import save_weights
 
 if __name__ == "__main__":
     train_path = "/home/choiyoonji/catkin_ws/src/soomac/src/vision/siamese_network/data/train"
@@ -101,6 +102,8 @@ if __name__ == "__main__":
                 },
                 os.path.join(out_path, "best.pth")
             )            
+            # 추론용 (weight만)
+            save_weights(model, backbone, os.path.join(out_path, "best_weights.pth"))
 
         if (epoch + 1) % save_after == 0:
             torch.save(
@@ -1,33 +1,85 @@
 import cv2
 import numpy as np
+from scipy import ndimage
+
+crop_size = 100
+
+def object_stats(segmask):
+    """ 모든 라벨의 bounding box, 면적, 중심점을 한번에 계산 (배경 0 제외)
+
+        @return: labels [N], boxes [N x 4] (x, y, w, h), areas [N], centroids [N x 2] (x, y)
+    """
+    segmask = np.asarray(segmask)
+    if not np.issubdtype(segmask.dtype, np.integer):
+        segmask = segmask.astype(np.int32)
+
+    # bounding box는 label image 한번 훑어서 모두 계산
+    slices = ndimage.find_objects(segmask)
+    labels = np.array([i + 1 for i, s in enumerate(slices) if s is not None], dtype=np.int64)
+    slices = [s for s in slices if s is not None]
+    boxes = np.array([[s[1].start, s[0].start, s[1].stop - s[1].start, s[0].stop - s[0].start]
+                      for s in slices], dtype=np.int64).reshape(-1, 4)
+
+    areas = np.bincount(segmask.ravel(), minlength=int(labels.max()) + 1 if len(labels) else 1)[labels]
+
+    # 중심점은 각 box 안에서만 (전체 프레임 반복 없음)
+    centroids = np.zeros((len(labels), 2))
+    for i, (label, s) in enumerate(zip(labels, slices)):
+        inside = segmask[s] == label
+        centroids[i, 0] = s[1].start + inside.sum(axis=0) @ np.arange(inside.shape[1]) / areas[i]
+        centroids[i, 1] = s[0].start + inside.sum(axis=1) @ np.arange(inside.shape[0]) / areas[i]
+
+    return labels, boxes, areas, centroids
+
+def crop_into(out, image, x0, y0, x1, y1):
+    # image[y0:y1, x0:x1]을 비율 유지 resize + 가운데 padding해서 out [100 x 100 x 3]에 BGR<->RGB 바꿔 기록 (add_padding과 동일)
+    cropped_img = image[y0:y1, x0:x1]
+    h, w = cropped_img.shape[:2]
+    target_h, target_w = out.shape[:2]
+    scale = min(target_w / w, target_h / h)
+    new_w = int(w * scale)
+    new_h = int(h * scale)
+    pad_w = (target_w - new_w) // 2
+    pad_h = (target_h - new_h) // 2
+
+    out[:] = 0
+    out[pad_h:pad_h+new_h, pad_w:pad_w+new_w] = cv2.resize(cropped_img, (new_w, new_h))[..., ::-1]
+
+def extract_objects(rgb_image, segmask, offset=10):
+    """ label mask의 모든 물체를 한번에 crop
+
+        @return: dictionary with
+                 'labels'    : [N] label 값 (오름차순, np.unique와 같은 순서)
+                 'coords'    : [N x 2] bounding box 좌상단 (x, y)
+                 'boxes'     : [N x 4] (x, y, w, h)
+                 'areas'     : [N] 픽셀 수
+                 'centroids' : [N x 2] (x, y)
+                 'crops'     : [N x 100 x 100 x 3] uint8 (batched matcher 입력으로 바로 사용)
+    """
+    labels, boxes, areas, centroids = object_stats(segmask)
+    height, width = rgb_image.shape[:2]
+
+    crops = np.empty((len(labels), crop_size, crop_size, 3), dtype=np.uint8)
+    for i, (x, y, w, h) in enumerate(boxes):
+        crop_into(crops[i], rgb_image, max(0, x-offset), max(0, y-offset),
+                  min(x+w+offset, width), min(y+h+offset, height))
+
+    return {'labels': labels, 'coords': boxes[:, :2], 'boxes': boxes,
+            'areas': areas, 'centroids': centroids, 'crops': crops}
 
 def extract_objects_from_image(rgb_image, segmask):
-    # 고유 라벨 값을 추출 (배경을 제외한)
-    unique_labels = np.unique(segmask)
-    unique_labels = unique_labels[unique_labels != 0]  # 배경 라벨(0)을 제외
+    # [([x, y], crop), ...] 형식 (crop은 extract_objects의 batch 일부)
+    objects = extract_objects(rgb_image, segmask)
+    return [(coord, crop) for coord, crop in zip(objects['coords'].tolist(), objects['crops'])]
 
-    cropped_images = []
-    
-    for label in unique_labels:
-        # 현재 라벨에 해당하는 마스크 생성
-        mask = np.where(segmask == label, 255, 0).astype(np.uint8)
-        
-        # 객체의 바운딩 박스 추출
-        offset = 10
-        x, y, w, h = cv2.boundingRect(mask)
-        print(x, y, w, h)
-        # RGB 이미지에서 객체 영역 크롭
-        x0 = max(0, x-offset)
-        y0 = max(0, y-offset)
-        x1 = min(x+w+offset, 640)
-        y1 = min(y+h+offset, 480)
-        cropped_img = rgb_image[y0:y1, x0:x1]
-        cropped_img = add_padding(cropped_img, [100, 100])
-        cropped_img = cv2.cvtColor(cropped_img, cv2.COLOR_BGR2RGB)
-        cropped_images.append(([x, y], cropped_img))
-        # print(cropped_img.shape)
-
-    return cropped_images
+def crop_boxes(rgb_image, boxes, offset=10):
+    # extract_objects_from_image와 같은 crop을 (x0, y0, x1, y1) box 목록으로부터 [N x 100 x 100 x 3] batch로 생성
+    height, width = rgb_image.shape[:2]
+    crops = np.empty((len(boxes), crop_size, crop_size, 3), dtype=np.uint8)
+    for i, (x0, y0, x1, y1) in enumerate(boxes):
+        crop_into(crops[i], rgb_image, max(0, x0-offset), max(0, y0-offset),
+                  min(x1+1+offset, width), min(y1+1+offset, height))
+    return crops
 
 def add_padding(image, target_size):
     h, w, _ = image.shape
@@ -0,0 +1,145 @@
+import numpy as np
+
+
+def cluster_statistics(points, labels, min_size=50, max_size=1000, camera_params=None):
+    """ Computes centroid, principal axes, theta and extent of every cluster at once.
+
+        Replaces the per-cluster select_by_index + sklearn PCA + AABB loop of
+        Vision.calc_position with segmented reductions over the whole cloud.
+        Clusters are returned in ascending label order, same as np.unique.
+
+        @param points: a [N x 3] numpy array of points
+        @param labels: a [N] numpy array of DBSCAN labels (-1 is noise)
+        @param min_size: minimum number of points of a kept cluster
+        @param max_size: maximum number of points of a kept cluster
+        @param camera_params: if given, also returns the image bounding box of each cluster
+
+        @return: a dictionary with
+                 'label'    : [K] cluster labels
+                 'count'    : [K] number of points per cluster
+                 'centroid' : [K x 3] cluster centroids
+                 'axes'     : [K x 3 x 3] principal axes, axes[k, i] is the i-th component
+                 'theta'    : [K] angle of the principal axis in the xy plane
+                 'extent'   : [K x 3] axis aligned bounding box extent
+                 'box'      : [K x 4] (x0, y0, x1, y1) image bounding box, only with camera_params
+    """
+    points = np.asarray(points)
+    labels = np.asarray(labels).astype(np.int64).ravel()
+
+    # 라벨 -1(noise)도 np.unique와 동일하게 하나의 군집으로 취급
+    offset = labels + 1
+    counts = np.bincount(offset)
+    keep = (counts >= min_size) & (counts <= max_size)
+
+    K = int(np.count_nonzero(keep))
+    if K == 0:
+        stats = {
+            'label': np.zeros(0, dtype=np.int64),
+            'count': np.zeros(0, dtype=np.int64),
+            'centroid': np.zeros((0, 3), dtype=points.dtype),
+            'axes': np.zeros((0, 3, 3)),
+            'theta': np.zeros(0),
+            'extent': np.zeros((0, 3), dtype=points.dtype),
+        }
+        if camera_params is not None:
+            stats['box'] = np.zeros((0, 4), dtype=np.int64)
+        return stats
+
+    # 남길 군집의 포인트만 0..K-1 인덱스로 다시 매핑
+    lut = np.full(counts.shape[0], -1, dtype=np.int64)
+    lut[keep] = np.arange(K)
+    idx = lut[offset]
+    mask = idx >= 0
+    idx = idx[mask]
+    pts = points[mask]
+    pts64 = pts.astype(np.float64)
+    n = counts[keep]
+
+    # 중심점: 좌표별 segmented sum
+    sums = np.stack([np.bincount(idx, weights=pts64[:, j], minlength=K) for j in range(3)], axis=1)
+    centroid = sums / n[:, None]
+
+    # 공분산: 중심점 기준 2차 모멘트 (6개 성분만 계산)
+    d = pts64 - centroid[idx]
+    cov = np.empty((K, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            s = np.bincount(idx, weights=d[:, i] * d[:, j], minlength=K)
+            cov[:, i, j] = s
+            cov[:, j, i] = s
+    cov /= np.maximum(n - 1, 1)[:, None, None]
+
+    # PCA: batched eigh, 고유값 내림차순으로 정렬
+    _, v = np.linalg.eigh(cov)
+    axes = np.swapaxes(v[..., ::-1], 1, 2)
+
+    # sklearn PCA의 svd_flip과 같은 부호 규칙 (절댓값이 가장 큰 성분이 양수)
+    max_abs = np.argmax(np.abs(axes), axis=2)
+    signs = np.sign(np.take_along_axis(axes, max_abs[..., None], axis=2))
+    signs[signs == 0] = 1
+    axes *= signs
+
+    theta = np.arctan2(axes[:, 0, 1], axes[:, 0, 0])
+
+    # AABB: 라벨 순으로 정렬 후 reduceat
+    order = np.argsort(idx, kind='stable')
+    sorted_pts = pts[order]
+    starts = np.concatenate([[0], np.cumsum(n)[:-1]])
+    extent = np.maximum.reduceat(sorted_pts, starts, axis=0) - np.minimum.reduceat(sorted_pts, starts, axis=0)
+
+    stats = {
+        'label': np.nonzero(keep)[0] - 1,
+        'count': n,
+        'centroid': centroid.astype(points.dtype),
+        'axes': axes,
+        'theta': theta,
+        'extent': extent,
+    }
+
+    if camera_params is not None:
+        # 이미지 좌표계 bounding box (compute_xyz는 y축이 위쪽이므로 행을 뒤집음)
+        pixels = image_pixels(sorted_pts, camera_params)
+        lo = np.minimum.reduceat(pixels, starts, axis=0)
+        hi = np.maximum.reduceat(pixels, starts, axis=0)
+        box = np.concatenate([np.floor(lo), np.ceil(hi)], axis=1)
+        box[:, [0, 2]] = np.clip(box[:, [0, 2]], 0, camera_params['img_width'] - 1)
+        box[:, [1, 3]] = np.clip(box[:, [1, 3]], 0, camera_params['img_height'] - 1)
+        stats['box'] = box.astype(np.int64)
+
+    return stats
+
+
+def grasp_poses_from_stats(stats):
+    """ Builds the grasp_pose records of Vision.calc_position from cluster_statistics output."""
+    grasp_poses = []
+    for k in range(stats['label'].shape[0]):
+        principal_axes = stats['axes'][k]
+        grasp_poses.append({
+            'position': stats['centroid'][k],
+            'principal_axis': principal_axes[0],  # 주축 (Grasp 방향)
+            'secondary_axis': principal_axes[1],  # 수평축 (회전 정의)
+            'normal_axis': principal_axes[2],     # 법선축
+            'theta': stats['theta'][k],
+            'grasp_width': stats['extent'][k][0]*1000
+        })
+    return grasp_poses
+
+
+def project_to_pixel(points, camera_params):
+    """ Projects [K x 3] camera frame points to [K x 2] pixel coordinates."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    u = points[:, 0] * camera_params['fx'] / points[:, 2] + camera_params['x_offset']
+    v = points[:, 1] * camera_params['fy'] / points[:, 2] + camera_params['y_offset']
+    return np.stack([u, v], axis=1)
+
+
+def image_pixels(points, camera_params):
+    """ Projects [K x 3] points of compute_xyz / back_project to [K x 2] (column, row) image pixels."""
+    pixels = project_to_pixel(points, camera_params)
+    pixels[:, 1] = camera_params['img_height'] - 1 - pixels[:, 1]
+    return pixels
+
+
+def nearest_cluster(pixels, target):
+    """ Returns the index of the pixel closest to target."""
+    return int(np.argmin(np.linalg.norm(pixels - np.asarray(target, dtype=np.float64), axis=1)))
@@ -0,0 +1,80 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+
+class PlaneModelCache:
+    """ Table plane models per camera pose, persisted as json.
+
+        The camera always returns to the same pose above the same table, so the first
+        RANSAC fit at a pose is stored and later frames are only checked against it with
+        one point-to-plane distance pass. RANSAC runs again only when the inlier ratio
+        drops below min_inlier_ratio. Only full-frame fits may replace the stored model:
+        a small window can be dominated by an object top, so windows use store=False.
+    """
+    def __init__(self, path, distance_threshold=0.01, min_inlier_ratio=0.5):
+        self.path = path
+        self.distance_threshold = distance_threshold
+        self.min_inlier_ratio = min_inlier_ratio
+
+        self.models = {}
+        self.hit = 0
+        self.refit = 0
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path) as json_file:
+                self.models = json.load(json_file)
+
+    def inliers(self, points, plane_model):
+        """ Returns the boolean inlier mask of [N x 3] points for plane_model [a, b, c, d]."""
+        plane_model = np.asarray(plane_model, dtype=np.float32)
+        normal = plane_model[:3]
+        dist = np.abs(points @ normal + plane_model[3]) / np.linalg.norm(normal)
+        return dist < self.distance_threshold
+
+    def segment(self, key, points, fit, store=True):
+        """ Same output as open3d segment_plane, using the cached model when it still fits.
+
+            @param key: camera pose key (e.g. '0,210,370,0')
+            @param points: a [N x 3] numpy array
+            @param fit: callable running RANSAC, returns (plane_model [4], inlier indices)
+            @param store: save a refit as the model of key (False for ROI windows: the refit is
+                          only used for these points)
+
+            @return: plane_model [4] numpy array, inlier indices numpy array
+        """
+        points = np.asarray(points, dtype=np.float32)
+        n = max(points.shape[0], 1)
+
+        with self._lock:
+            cached = self.models.get(key)
+
+        if cached is not None:
+            mask = self.inliers(points, cached['plane'])
+            ratio = np.count_nonzero(mask) / n
+            if ratio >= self.min_inlier_ratio:
+                self.hit += 1
+                return np.asarray(cached['plane'], dtype=np.float32), np.nonzero(mask)[0]
+
+        plane_model, inliers = fit()
+        plane_model = np.asarray(plane_model, dtype=np.float32)
+        inliers = np.asarray(inliers, dtype=np.int64)
+        self.refit += 1
+
+        # 테이블이 대부분인 경우에만 저장 (물체 윗면을 평면으로 잡은 경우 제외)
+        ratio = inliers.shape[0] / n
+        if store and ratio >= self.min_inlier_ratio:
+            with self._lock:
+                self.models[key] = {'plane': plane_model.tolist(), 'inlier_ratio': ratio}
+                self.save()
+
+        return plane_model, inliers
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as json_file:
+            json.dump(self.models, json_file, indent=4)
+        os.replace(tmp_path, self.path)
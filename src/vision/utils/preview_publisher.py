@@ -0,0 +1,90 @@
+import time
+
+import cv2
+import numpy as np
+import rospy
+from cv_bridge import CvBridge
+from sensor_msgs.msg import Image, CompressedImage
+from std_msgs.msg import Float32MultiArray as fl
+
+
+class PreviewPublisher:
+    """ Publishes camera preview frames only as much as subscribers need.
+
+        - nothing is encoded for a topic without subscribers
+        - /rgb_frame/compressed : downscaled jpeg preview for the GUI
+        - /depth_frame          : published at depth_rate [Hz] only
+        - /preview_stats        : [fps, bytes per second] of the last stats_period seconds
+    """
+    def __init__(self, scale=1.0, jpeg_quality=80, depth_rate=5.0, stats_period=1.0):
+        self.rgb_pub = rospy.Publisher('/rgb_frame', Image, queue_size=1)
+        self.depth_pub = rospy.Publisher('/depth_frame', Image, queue_size=1)
+        self.compressed_pub = rospy.Publisher('/rgb_frame/compressed', CompressedImage, queue_size=1)
+        self.stats_pub = rospy.Publisher('/preview_stats', fl, queue_size=1)
+
+        self.bridge = CvBridge()
+        self.scale = scale
+        self.encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.depth_period = 1.0 / depth_rate if depth_rate > 0 else float('inf')
+        self.last_depth_time = 0
+        self.small = None  # downscale buffer
+
+        self.stats_period = stats_period
+        self.stats_start = time.time()
+        self.frame_count = 0
+        self.byte_count = 0
+
+    def publish(self, color_frame, depth_frame, stamp=None):
+        stamp = rospy.Time.now() if stamp is None else stamp
+        published = False
+
+        if self.rgb_pub.get_num_connections() > 0:
+            msg = self.bridge.cv2_to_imgmsg(color_frame, encoding='bgr8')
+            msg.header.stamp = stamp
+            self.rgb_pub.publish(msg)
+            self.byte_count += len(msg.data)
+            published = True
+
+        if self.compressed_pub.get_num_connections() > 0:
+            preview = color_frame
+            if self.scale != 1.0:
+                h, w = color_frame.shape[:2]
+                size = (int(w * self.scale), int(h * self.scale))
+                if self.small is None or self.small.shape[:2] != size[::-1]:
+                    self.small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                cv2.resize(color_frame, size, dst=self.small, interpolation=cv2.INTER_AREA)
+                preview = self.small
+
+            ret, jpeg = cv2.imencode('.jpg', preview, self.encode_param)
+            if ret:
+                msg = CompressedImage()
+                msg.header.stamp = stamp
+                msg.format = 'jpeg'
+                msg.data = jpeg.tobytes()
+                self.compressed_pub.publish(msg)
+                self.byte_count += len(msg.data)
+                published = True
+
+        now = time.time()
+        if now - self.last_depth_time >= self.depth_period and self.depth_pub.get_num_connections() > 0:
+            msg = self.bridge.cv2_to_imgmsg(depth_frame, encoding='16UC1')
+            msg.header.stamp = stamp
+            self.depth_pub.publish(msg)
+            self.byte_count += len(msg.data)
+            self.last_depth_time = now
+
+        if published:
+            self.frame_count += 1
+        self.report(now)
+
+    def report(self, now):
+        elapsed = now - self.stats_start
+        if elapsed < self.stats_period:
+            return
+        stats = fl()
+        stats.data = [self.frame_count / elapsed, self.byte_count / elapsed]
+        self.stats_pub.publish(stats)
+
+        self.stats_start = now
+        self.frame_count = 0
+        self.byte_count = 0
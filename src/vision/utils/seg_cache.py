@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+import zipfile
+import threading
+
+import numpy as np
+
+
+class SegmentationCache:
+    """ Content addressed cache of segmentation + crop results of one task folder.
+
+        key = sha1(capture file bytes + segmentation params), so a retaken capture or changed
+        params never hit an old entry. Each entry is one .npz with
+            'mask'     : [H x W] uint8 label mask
+            'coords'   : [K x 2] crop coordinates (extract_objects_from_image)
+            'crops'    : [K x 100 x 100 x 3] uint8 crops
+            'feat'     : [K x D] float32 crop embeddings (optional, valid for 'embed_key' only)
+        Entries are evicted least recently used first when the folder exceeds max_bytes.
+    """
+    def __init__(self, path, params=None, max_bytes=256*1024*1024):
+        self.path = path
+        self.params = json.dumps(params or {}, sort_keys=True)
+        self.max_bytes = max_bytes
+
+        self.hit = 0
+        self.miss = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, capture_path):
+        sha = hashlib.sha1(self.params.encode())
+        with open(capture_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """ @return: dictionary of the entry, or None"""
+        path = self.entry_path(key)
+        try:
+            with np.load(path) as data:
+                entry = {k: data[k] for k in data.files}
+            os.utime(path)  # LRU 순서 갱신
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            with self._lock:
+                self.miss += 1
+            return None
+
+        entry['embed_key'] = str(entry['embed_key']) if 'embed_key' in entry else None
+        with self._lock:
+            self.hit += 1
+        return entry
+
+    def put(self, key, mask, coords, crops, feat=None, embed_key=None):
+        arrays = {
+            'mask': np.asarray(mask, dtype=np.uint8),
+            'coords': np.asarray(coords, dtype=np.int64).reshape(-1, 2),
+            'crops': np.asarray(crops, dtype=np.uint8).reshape(-1, 100, 100, 3),
+        }
+        if feat is not None:
+            arrays['feat'] = np.asarray(feat, dtype=np.float32)
+            arrays['embed_key'] = np.array(embed_key)
+
+        path = self.entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.path):
+                if not name.endswith('.npz'):
+                    continue
+                stat = os.stat(os.path.join(self.path, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            return {'hit': self.hit, 'miss': self.miss}
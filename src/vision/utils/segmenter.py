@@ -0,0 +1,166 @@
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+from realsense.capture import load_capture
+
+
+def label_mask(seg):
+    # uois.run이 반환한 mask를 segmask png를 다시 읽은 것과 같은 [H x W] uint8 label mask로
+    return np.squeeze(np.asarray(seg)).astype(np.uint8)
+
+
+class UoisSegmenter:
+    """ UOIS network (external uois module). Inference is serialized with a lock."""
+    name = 'uois'
+
+    def __init__(self):
+        from uois.Uois import Uois
+        self.uois = Uois()
+        self.lock = threading.Lock()
+
+    def params(self):
+        return {}
+
+    def segment(self, capture_path, segmask_path):
+        """ @return: [H x W x 3] rgb, [H x W] uint8 label mask (also written to segmask_path)"""
+        if capture_path.endswith('.npy'):
+            with self.lock:
+                rgb, seg = self.uois.run(capture_path, segmask_path)
+            return rgb, label_mask(seg)
+
+        # Uois는 {'rgb', 'xyz'} pickle .npy 경로를 입력으로 받으므로 임시 파일로 변환
+        capture = load_capture(capture_path)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            legacy_path = os.path.join(tmp_dir, 'capture.npy')
+            np.save(legacy_path, capture.as_dict())
+            with self.lock:
+                rgb, seg = self.uois.run(legacy_path, segmask_path)
+        return rgb, label_mask(seg)
+
+
+class GeometricSegmenter:
+    """ CPU only segmentation of objects on a table from the organized xyz image.
+
+        1. RANSAC table plane on a subsample of the valid points (+ least squares refit)
+        2. foreground = points between plane_threshold and max_height above the table
+        3. depth discontinuities (4-neighbour |dz| > depth_jump) cut the foreground
+        4. image-space connected components, components smaller than min_area dropped,
+           edge pixels given back to the neighbouring component
+
+        The output is the same [H x W] uint8 label mask as UoisSegmenter
+        (0: background/table, 1..K: objects).
+    """
+    name = 'geometric'
+
+    def __init__(self, plane_threshold=0.01, max_height=0.3, depth_jump=0.01, min_area=100,
+                 ransac_points=4000, ransac_iterations=200, seed=0):
+        self.plane_threshold = plane_threshold      # [m]
+        self.max_height = max_height                # [m]
+        self.depth_jump = depth_jump                # [m]
+        self.min_area = min_area                    # [px]
+        self.ransac_points = ransac_points
+        self.ransac_iterations = ransac_iterations
+        self.seed = seed
+
+    def params(self):
+        return {'plane_threshold': self.plane_threshold, 'max_height': self.max_height,
+                'depth_jump': self.depth_jump, 'min_area': self.min_area,
+                'ransac_points': self.ransac_points, 'ransac_iterations': self.ransac_iterations,
+                'seed': self.seed}
+
+    def segment(self, capture_path, segmask_path):
+        """ @return: [H x W x 3] rgb, [H x W] uint8 label mask (also written to segmask_path)"""
+        capture = load_capture(capture_path)
+        mask = self.label(capture.xyz)
+        if segmask_path:
+            cv2.imwrite(segmask_path, mask)
+        return capture.rgb, mask
+
+    def fit_plane(self, points):
+        """ @param points: [N x 3] float32 valid points
+
+            @return: plane [a, b, c, d] with unit normal, d > 0 (camera side is positive), or None
+        """
+        if len(points) < 3:
+            return None
+        # 같은 장면은 같은 평면이 나오도록 seed 고정
+        rng = np.random.default_rng(self.seed)
+        if len(points) > self.ransac_points:
+            points = points[rng.choice(len(points), self.ransac_points, replace=False)]
+
+        # 모든 가설을 한번에: [I x 3] 법선, [N x I] 거리
+        sample = points[rng.integers(0, len(points), size=(self.ransac_iterations, 3))]
+        normal = np.cross(sample[:, 1] - sample[:, 0], sample[:, 2] - sample[:, 0])
+        norm = np.linalg.norm(normal, axis=1)
+        valid = norm > 1e-9
+        if not np.any(valid):
+            return None
+        normal = normal[valid] / norm[valid, None]
+        d = -np.einsum('ij,ij->i', normal, sample[valid, 0])
+
+        inliers = np.abs(points @ normal.T + d) < self.plane_threshold
+        inliers = inliers[:, np.argmax(inliers.sum(axis=0))]
+
+        # inlier 전체로 least squares 평면
+        centroid = points[inliers].mean(axis=0)
+        normal = np.linalg.svd(points[inliers] - centroid, full_matrices=False)[2][2]
+        d = -normal @ centroid
+        if d < 0:
+            normal, d = -normal, -d
+        return np.append(normal, d).astype(np.float32)
+
+    def label(self, xyz):
+        """ @param xyz: [H x W x 3] organized point cloud in camera frame [m] (z = 0 for holes)
+
+            @return: [H x W] uint8 label mask
+        """
+        xyz = np.asarray(xyz, dtype=np.float32)
+        z = xyz[..., 2]
+        valid = np.isfinite(z) & (z > 0)
+
+        # 평면 추정은 격자로 솎은 점만 사용 (전체 boolean indexing은 느림)
+        step = max(1, int(np.sqrt(z.size / self.ransac_points)))
+        plane = self.fit_plane(xyz[::step, ::step][valid[::step, ::step]])
+        if plane is None:
+            return np.zeros(z.shape, dtype=np.uint8)
+
+        # 테이블 위 높이 (카메라 쪽이 +)
+        height = xyz @ plane[:3] + plane[3]
+        foreground = valid & (height > self.plane_threshold) & (height < self.max_height)
+
+        # 깊이가 끊기는 픽셀에서 분리 (앞뒤로 겹친 물체)
+        edge = np.zeros_like(foreground)
+        edge[:, :-1] |= np.abs(np.diff(z, axis=1)) > self.depth_jump
+        edge[:-1, :] |= np.abs(np.diff(z, axis=0)) > self.depth_jump
+        edge &= foreground
+
+        num, components, stats, _ = cv2.connectedComponentsWithStats(
+            (foreground & ~edge).astype(np.uint8), connectivity=4)
+
+        # 작은 조각 제거, 1..K로 다시 번호 (uint8 이므로 최대 255개)
+        keep = np.nonzero(stats[1:, cv2.CC_STAT_AREA] >= self.min_area)[0][:255] + 1
+        lut = np.zeros(num, dtype=np.uint8)
+        lut[keep] = np.arange(1, len(keep) + 1)
+        mask = lut[components]
+
+        # 경계 픽셀은 이웃한 물체로
+        grown = cv2.dilate(mask, np.ones((3, 3), np.uint8))
+        fill = edge & (mask == 0)
+        mask[fill] = grown[fill]
+        return mask
+
+
+segmenters = {
+    'uois': UoisSegmenter,
+    'geometric': GeometricSegmenter,
+}
+
+
+def make_segmenter(name, **params):
+    if name not in segmenters:
+        raise ValueError(f"unknown segmenter '{name}' (choose from {sorted(segmenters)})")
+    return segmenters[name](**params)
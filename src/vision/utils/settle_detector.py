@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+
+
+class SettleDetector:
+    """ Waits until the scene seen by the camera stops moving.
+
+        Consecutive depth frames captured after a given time are compared with the mean
+        absolute depth delta over a decimated grid. The scene is settled once that delta
+        stays under threshold for stable_frames depth frames in a row.
+    """
+    def __init__(self, camera, depth_scale, step=8, threshold=0.003, stable_frames=3, timeout=5.0):
+        self.camera = camera
+        self.depth_scale = depth_scale
+        self.step = step
+        self.threshold = threshold          # [m]
+        self.stable_frames = stable_frames
+        self.timeout = timeout              # 최대 대기 시간 [s]
+
+    def delta(self, depth0, depth1):
+        """ Mean absolute depth difference [m] of two depth images over valid pixels of the grid."""
+        d0 = depth0[::self.step, ::self.step].astype(np.int32)
+        d1 = depth1[::self.step, ::self.step].astype(np.int32)
+        valid = (d0 > 0) & (d1 > 0)
+        if not np.any(valid):
+            return np.inf
+        return np.abs(d0 - d1)[valid].mean() * self.depth_scale
+
+    def wait(self, since, fusion=None):
+        """ @param since: host time (time.time()), only frames captured after it are used
+            @param fusion: optional DepthFusion, filled with the depth frames of the stable run
+
+            @return: (last Frame, settle time [s], settled or timed out)
+        """
+        deadline = since + self.timeout
+        prev = self.camera.wait_newer_than(since, timeout=max(0., deadline - time.time()))
+        if prev is None:
+            return self.camera.latest(), time.time() - since, False
+
+        stable = 0
+        frame = prev
+        if fusion is not None:
+            fusion.reset()
+            fusion.add(prev.depth)
+        while True:
+            frame = self.camera.wait_newer_than(frame.timestamp, timeout=max(0., deadline - time.time()))
+            if frame is None:
+                return self.camera.latest(), time.time() - since, False
+
+            # depth는 color보다 느리게 들어오므로 새 depth 프레임만 비교
+            if frame.depth_timestamp == prev.depth_timestamp:
+                continue
+
+            if self.delta(prev.depth, frame.depth) < self.threshold:
+                stable += 1
+            else:
+                stable = 0
+                if fusion is not None:
+                    fusion.reset()
+            if fusion is not None:
+                fusion.add(frame.depth)
+            if stable >= self.stable_frames:
+                return frame, frame.timestamp - since, True
+            prev = frame